@@ -1,6 +1,23 @@
 import numpy as np
+import os
 from parameters import *
 
+# Columns of the airfoil ranking table, the first four identify the polar (names as objects, XFLR5 names have no length limit)
+RANKING_FIELDS = [('airfoil', 'O'), ('file', 'O'), ('Re', 'f8'), ('Ncrit', 'f8'), ('LD_CR', 'f8'), ('cd_min', 'f8'),
+                  ('cl_cdmin', 'f8'), ('delta_cl', 'f8'), ('cl_alpha', 'f8'), ('cl_0', 'f8'), ('cm_CR', 'f8'),
+                  ('alpha_CR', 'f8'), ('alpha_0L', 'f8'), ('cl_max', 'f8'), ('alpha_stall', 'f8'), ('M_local', 'f8')]
+
+def interp_crossing(x, target, *columns):
+    # Rows of padded (polars, rows) arrays: linear interpolation of every column where x first crosses target, nan if it never does
+    d = x - target
+    cross = d[:, :-1]*d[:, 1:] <= 0 # nan padding never crosses
+    i = np.argmax(cross, axis=1)
+    found = cross.any(axis=1)
+    p = np.arange(len(x))
+    d0, d1 = d[p, i], d[p, i + 1]
+    w = np.where(d0 != d1, d0/np.where(d0 != d1, d0 - d1, 1), 0)
+    return [np.where(found, c[p, i] + w*(c[p, i + 1] - c[p, i]), np.nan) for c in columns]
+
 class Calc():
     def __init__(self, INT_INTRVLS):
         self.INT_INTRVLS = INT_INTRVLS
@@ -49,9 +66,50 @@ class Calc():
             CD_wave = 0.002 * (1 + 2.5 * (MDD - M)/0.05)**(2.5)
         return CD_wave
     
-    def getLD(self, polar_file):
+    def rankAirfoils(self, store, cl_CR=CL_CRUISE, M=M_CRUISE, slope_window=2.0):
+        # getLD's metrics for every polar of a PolarStore at once, read at cl_CR by interpolation instead of the nearest
+        # sample. cl is Prandtl-Glauert corrected to M, cl_alpha [1/rad] is a least squares fit within slope_window deg
+        # of alpha_CR. Returns a structured array sorted on LD_CR (best first), sortable on any other field with np.sort.
+        columns, _ = store.padded(['alpha', 'CL', 'CD', 'Cm', 'Cpmin'])
+        alpha, cd, cm = columns['alpha'], columns['CD'], columns['Cm']
+        beta = np.sqrt(1-M**2)
+        cl = columns['CL']/beta
+        
+        v = np.sqrt(1-columns['Cpmin']/beta)*V_CRUISE*np.cos(np.deg2rad(LAMBDA_LE))
+        LD_CR, cm_CR, alpha_CR, M_local = interp_crossing(cl, cl_CR, cl/cd, cm, alpha, v/a_CRUISE)
+        cl_0, = interp_crossing(alpha, 0, cl)
+        alpha_0L, = interp_crossing(cl, 0, alpha)
+        
+        i_cdmin = np.argmin(np.where(np.isnan(cd), np.inf, cd), axis=1)
+        i_clmax = np.argmax(np.where(np.isnan(cl), -np.inf, cl), axis=1)
+        p = np.arange(len(cl))
         
-        polar = np.loadtxt(polar_file, skiprows=11)
+        near = np.abs(alpha - alpha_CR[:, None]) <= slope_window # nan rows and polars drop out
+        n = near.sum(axis=1)
+        a_mean = np.where(near, alpha, 0).sum(axis=1)/np.maximum(n, 1)
+        cl_mean = np.where(near, cl, 0).sum(axis=1)/np.maximum(n, 1)
+        da = np.where(near, alpha - a_mean[:, None], 0)
+        cl_alpha = np.where(n > 1, (da*np.where(near, cl - cl_mean[:, None], 0)).sum(axis=1)/np.maximum((da**2).sum(axis=1), 1e-12), np.nan)*180/np.pi
+        
+        table = np.zeros(len(store), dtype=RANKING_FIELDS)
+        for name in ['airfoil', 'file', 'Re', 'Ncrit']:
+            table[name] = [e[name] for e in store.entries]
+        table['LD_CR'], table['cd_min'], table['cl_cdmin'] = LD_CR, cd[p, i_cdmin], cl[p, i_cdmin]
+        table['delta_cl'] = np.abs(cl_CR - table['cl_cdmin'])
+        table['cl_alpha'], table['cl_0'], table['cm_CR'] = cl_alpha, cl_0, cm_CR
+        table['alpha_CR'], table['alpha_0L'] = alpha_CR, alpha_0L
+        table['cl_max'], table['alpha_stall'] = cl[p, i_clmax]*beta, alpha[p, i_clmax]
+        table['M_local'] = M_local
+        return table[np.argsort(-np.nan_to_num(LD_CR, nan=-np.inf), kind='stable')]
+    
+    def printRanking(self, table, fields=('LD_CR', 'cd_min', 'delta_cl', 'cm_CR', 'alpha_CR', 'alpha_0L', 'cl_max', 'M_local')):
+        print(f'{"airfoil":40s} {"Re":>8s} {"Ncrit":>5s} ' + ' '.join(f'{f:>9s}' for f in fields))
+        for row in table:
+            print(f'{row["airfoil"][:40]:40s} {row["Re"]/1e6:7.2f}M {row["Ncrit"]:5.1f} ' + ' '.join(f'{row[f]:9.4g}' for f in fields))
+    
+    def getLD(self, polar_file):
+        # polar_file is an XFLR5 export or its data rows (e.g. from a PolarStore)
+        polar = np.loadtxt(polar_file, skiprows=11) if isinstance(polar_file, (str, os.PathLike)) else np.asarray(polar_file)
         
         cl = polar[:,1]/np.sqrt(1-0.68**2)
         cd = polar[:,2]
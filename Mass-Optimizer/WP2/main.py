@@ -1,6 +1,6 @@
 from calc import *
+from polars import PolarStore
 import numpy as np
-import os
 
 np.set_printoptions(suppress=True)
 
@@ -13,11 +13,6 @@ if __name__ == '__main__':
     # print(b/2*np.tan(np.deg2rad(LAMBDA_LE)))
     
     dir = 'WP2/xflr_data'
+    store = PolarStore('WP2/polarStore').ingest(dir) # parses the text files only when they changed
 
-    for entry in os.scandir(dir):
-        if entry.is_file():
-            # try:
-            print(entry.path)
-            Calc.getLD(Calc, entry.path)
-            # # except:
-            #     print(entry.path, 'Failed')
+    calc.printRanking(calc.rankAirfoils(store))
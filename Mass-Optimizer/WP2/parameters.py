@@ -10,6 +10,8 @@ TAPER_RATIO = 0.363 # [-]
 V_CRUISE = 200.62878
 
 a_CRUISE = 295.042
+M_CRUISE = 0.68
+CL_CRUISE = 0.2643 # airfoil cl at cruise
 
 C_ROOT = 3.369056118203828 # [m]
 C_TIP = 1.2229673709079896 # [m] 
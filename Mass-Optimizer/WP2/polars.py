@@ -0,0 +1,110 @@
+import numpy as np
+import json
+import os
+import re
+
+# XFLR5 polar columns; v6 writes two more values than it names, kept as extra10/extra11
+COLUMNS = ['alpha', 'CL', 'CD', 'CDp', 'Cm', 'Top_Xtr', 'Bot_Xtr', 'Cpmin', 'Chinge', 'XCp', 'extra10', 'extra11']
+HEADER_ROWS = 11
+
+
+def parse_polar(path):
+    # Header metadata and the (rows, 12) data block of one XFLR5 polar export, None if it holds no points
+    with open(path) as f:
+        lines = f.read().splitlines()
+    airfoil = re.search(r'Calculated polar for:\s*(.*\S)', '\n'.join(lines[:HEADER_ROWS])).group(1)
+    conditions = re.search(r'Mach\s*=\s*([\d.]+)\s+Re\s*=\s*([\d.]+)\s*e\s*(\d+)\s+Ncrit\s*=\s*([\d.]+)', '\n'.join(lines[:HEADER_ROWS]))
+    rows = [line.split() for line in lines[HEADER_ROWS:] if line.strip()]
+    if not rows:
+        return None
+    data = np.full((len(rows), len(COLUMNS)), np.nan)
+    for i, row in enumerate(rows):
+        data[i, :len(row)] = row[:len(COLUMNS)]
+    return {'airfoil': airfoil, 'Mach': float(conditions.group(1)), 'Re': float(conditions.group(2))*10**int(conditions.group(3)),
+            'Ncrit': float(conditions.group(4)), 'file': os.path.basename(path), 'rows': len(rows)}, data
+
+class PolarStore():
+    def __init__(self, path='polarStore'):
+        # Every polar of a directory in one column-major float array (path.npy, memory-mapped, each column contiguous)
+        # plus an index (path.json) of its header metadata and row range, keyed on (airfoil, Re, Ncrit).
+        # ingest() only re-parses the text files when the directory listing, sizes or times changed.
+        self.path = path
+        self.entries = []
+        self.data = np.empty((0, len(COLUMNS)))
+        self.sources = {}
+        self.keys = {}
+        if os.path.exists(f'{path}.json') and os.path.exists(f'{path}.npy'):
+            self.load()
+
+    def load(self):
+        with open(f'{self.path}.json') as f:
+            index = json.load(f)
+        self.entries, self.sources = index['entries'], index['sources']
+        self.data = np.load(f'{self.path}.npy', mmap_mode='r')
+        self.keys = {} # several files may hold the same airfoil and conditions
+        for i, e in enumerate(self.entries):
+            self.keys.setdefault(self.key(e['airfoil'], e['Re'], e['Ncrit']), []).append(i)
+
+    @staticmethod
+    def key(airfoil, Re, Ncrit):
+        return airfoil, round(float(Re)), round(float(Ncrit), 3)
+
+    @staticmethod
+    def scan(directory):
+        # file name -> (size, modification time) of every polar text file
+        return {entry.name: [entry.stat().st_size, entry.stat().st_mtime] for entry in os.scandir(directory)
+                if entry.is_file() and entry.name.endswith('.txt')}
+
+    def ingest(self, directory):
+        sources = self.scan(directory)
+        if sources == self.sources:
+            return self
+
+        entries, blocks, start = [], [], 0
+        for name in sorted(sources):
+            polar = parse_polar(os.path.join(directory, name))
+            if polar is None:
+                continue
+            entry, data = polar
+            entries.append({**entry, 'start': start, 'stop': start + len(data)})
+            blocks.append(data)
+            start += len(data)
+
+        data = np.concatenate(blocks) if blocks else np.empty((0, len(COLUMNS)))
+        np.save(f'{self.path}.npy', np.asfortranarray(data))
+        with open(f'{self.path}.json', 'w') as f:
+            json.dump({'columns': COLUMNS, 'entries': entries, 'sources': sources}, f, indent=1)
+        self.load()
+        return self
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        # Rows of the i-th polar, a view into the memory-mapped store
+        return self.data[self.entries[i]['start']:self.entries[i]['stop']]
+
+    def get(self, airfoil, Re, Ncrit):
+        # First file (by name) holding that polar
+        return self[self.keys[self.key(airfoil, Re, Ncrit)][0]]
+
+    def select(self, airfoil=None, Re=None, Ncrit=None):
+        # Positions of the polars matching every given field
+        if None not in (airfoil, Re, Ncrit):
+            return self.keys.get(self.key(airfoil, Re, Ncrit), [])
+        return [i for i, e in enumerate(self.entries)
+                if (airfoil is None or e['airfoil'] == airfoil) and (Re is None or round(e['Re']) == round(Re))
+                and (Ncrit is None or round(e['Ncrit'], 3) == round(Ncrit, 3))]
+
+    def column(self, name):
+        return self.data[:, COLUMNS.index(name)]
+
+    def padded(self, columns=COLUMNS, positions=None):
+        # (polars, max rows) arrays of the given columns, nan past the end of each polar, and the row counts
+        positions = range(len(self)) if positions is None else positions
+        start = np.array([self.entries[i]['start'] for i in positions], dtype=int)
+        rows = np.array([self.entries[i]['stop'] - self.entries[i]['start'] for i in positions], dtype=int)
+        r = np.arange(rows.max(initial=0))
+        valid = r < rows[:, None]
+        idx = np.where(valid, start[:, None] + r, 0)
+        return {name: np.where(valid, self.column(name)[idx], np.nan) for name in columns}, rows
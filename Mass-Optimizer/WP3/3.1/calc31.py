@@ -1,10 +1,90 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from parameters import *
+from parameters31 import *
+
+# ISA layers: (top altitude [m], lapse rate [K/m]), above the last top the atmosphere is held constant
+ISA_LAYERS = [
+    (11000, -0.0065),
+    (20000, 0),
+    (32000, 0.001),
+    (47000, 0.0028),
+    (51000, 0),
+    (71000, -0.0028),
+    (86000, -0.002)]
+
+class Atmosphere():
+    def __init__(self, layers=ISA_LAYERS, T0=288.15, p0=101325, g=9.80665, R=287):
+        # Base altitude, temperature and pressure of every layer, so any altitude is one step from its layer base
+        self.g, self.R = g, R
+        self.h_top = np.array([hLimit for hLimit, _ in layers], dtype=float)
+        self.lapse = np.array([a for _, a in layers], dtype=float)
+        h_base, T_base, p_base = [0], [T0], [p0]
+        for hLimit, a in layers[:-1]:
+            T, p = self.layer(hLimit - h_base[-1], T_base[-1], p_base[-1], a)
+            h_base.append(hLimit)
+            T_base.append(T)
+            p_base.append(p)
+        self.h_base, self.T_base, self.p_base = np.array(h_base, dtype=float), np.array(T_base), np.array(p_base)
+        self.table, self.step = None, None
+
+    def layer(self, delta_h, T0, p0, a):
+        # Temperature and pressure delta_h above a layer base, isothermal where a == 0
+        T1 = T0 + a*delta_h
+        a_safe = np.where(a == 0, 1, a)
+        p1 = np.where(a == 0, p0*np.exp(-self.g*delta_h/(self.R*T0)), p0*(T1/T0)**(-self.g/(a_safe*self.R)))
+        return T1, p1
+
+    def __call__(self, h):
+        # T [K], p [Pa] and rho [kg/m³] for an altitude array of any shape, clamped to [0, top of the last layer]
+        h = np.clip(np.asarray(h, dtype=float), 0, self.h_top[-1])
+        if self.table is not None:
+            return self.lookup(h)
+        i = np.minimum(np.searchsorted(self.h_top, h), self.h_top.size - 1) # nan sorts past the end, it propagates to T, p and rho
+        T, p = self.layer(h - self.h_base[i], self.T_base[i], self.p_base[i], self.lapse[i])
+        return T, p, p/(self.R*T)
+
+    def tabulate(self, step=1.0):
+        # Samples T, p and rho every step metres; later calls interpolate linearly with no search
+        h = np.arange(0, self.h_top[-1] + step, step)
+        self.table, self.step = None, step
+        values = np.stack(self(h))
+        self.table = values[:, :-1], np.diff(values, axis=-1) # value and slope per interval
+        return self
+
+    def lookup(self, h):
+        x = h/self.step
+        i = np.clip(np.nan_to_num(x).astype(int), 0, self.table[0].shape[1] - 1)
+        w = x - i
+        return tuple(value[i] + w*slope[i] for value, slope in zip(*self.table))
+
+def find_root(f, lo, hi, args=(), xtol=1e-6, maxiter=100):
+    # Illinois (bracketed secant), elementwise over broadcast brackets and args. f only sees the entries still iterating;
+    # the result is nan where [lo, hi] is not finite or f does not change sign on it
+    a, b, *args = np.broadcast_arrays(np.asarray(lo, dtype=float), np.asarray(hi, dtype=float), *args)
+    shape = a.shape
+    a, b, *args = (x.flatten() for x in (a, b, *args))
+    call = lambda x, mask: f(x[mask], *(arg[mask] for arg in args))
+    
+    fa, fb = np.full(a.shape, np.nan), np.full(b.shape, np.nan)
+    valid = np.isfinite(a) & np.isfinite(b)
+    fa[valid], fb[valid] = call(a, valid), call(b, valid)
+    bracketed = valid & (np.sign(fa) != np.sign(fb))
+    active = bracketed & (np.abs(b - a) > xtol) & (fb != 0)
+
+    for _ in range(maxiter):
+        if not active.any():
+            break
+        c = b[active] - fb[active]*(b[active] - a[active])/(fb[active] - fa[active])
+        fc = f(c, *(arg[active] for arg in args))
+        flip = np.sign(fc) != np.sign(fb[active])
+        a[active], fa[active] = np.where(flip, b[active], a[active]), np.where(flip, fb[active], fa[active]/2) # halving the stale end keeps it superlinear
+        b[active], fb[active] = c, fc
+        active &= (np.abs(b - a) > xtol) & (fb != 0)
+    return np.where(bracketed, b, np.nan).reshape(shape)
 
 class Calc():
-    def __init__(self):
-        pass
+    def __init__(self, atmosphere=None):
+        self.atmosphere = atmosphere or Atmosphere()
     
     # Returns SL Thrust and corresponding Thrust at CR (equal to drag)
     def thrust(self):
@@ -23,68 +103,55 @@ class Calc():
         CD = C_D0 + CL_DES**2/(np.pi*ASPECT_RATIO*e)
         return np.sqrt(2*T_alt/(CD*rho*S))        
     
-    def v_max(self, T, WS, rho, C_D0, A, e):
+    def v_max(self, T, WS, rho, C_D0, A, e, clip=False):
         T_alt = T*(rho/RHO_SL)
         W = WS*S
         
         TWmax = T_alt/W
+        excess = TWmax**2-4*C_D0/(np.pi*e*A) # < 0 above the absolute ceiling
+        if clip:
+            excess = np.maximum(excess, 0)
         
-        return np.sqrt((TWmax*WS+WS*np.sqrt(TWmax**2-4*C_D0/(np.pi*e*A)))/(rho*C_D0))
+        return np.sqrt((TWmax*WS+WS*np.sqrt(excess))/(rho*C_D0))
+    
+    def thrust_excess(self, h, T, WS):
+        # (T/W)² - 4CD0/(πeA), zero at the absolute ceiling where the maximum thrust only just meets the minimum drag
+        TWmax = T*(self.h_to_rho(h)/RHO_SL)/(WS*S)
+        return TWmax**2-4*C_D0/(np.pi*e*ASPECT_RATIO)
+    
+    def envelope(self, WS=WS_CR, T=TMAX_SL, h_min=0, h_max=None, xtol=1e-6):
+        # Absolute ceiling and the altitudes below it where the thrust limits meet the stall speed, by root finding on the
+        # continuous model. WS and T broadcast, so many weight/thrust configurations are solved at once. nan: no crossing,
+        # e.g. stall_max_thrust for the design point, whose maximum speed stays above stall up to the ceiling (thrust
+        # limited ceiling, the envelope closes on the ceiling line instead of a stall/thrust corner).
+        h_max = self.atmosphere.h_top[-1] if h_max is None else h_max
+        ceiling = find_root(self.thrust_excess, h_min, h_max, (T, WS), xtol)
+        
+        stall = lambda h, WS: self.v_stall(WS, self.h_to_rho(h), CL_MAX)
+        v_max_stall = lambda h, T, WS: self.v_max(T, WS, self.h_to_rho(h), C_D0, ASPECT_RATIO, e, clip=True) - stall(h, WS)
+        v_min_stall = lambda h, T, WS: self.v_min_thrust(T, self.h_to_rho(h)) - stall(h, WS)
+        
+        h_stall_max = find_root(v_max_stall, h_min, ceiling, (T, WS), xtol)
+        h_stall_min = find_root(v_min_stall, h_min, ceiling, (T, WS), xtol)
+        
+        T_ceil, _, rho_ceil = self.ISA(ceiling)
+        a_ceil = np.sqrt(GAMMA*R_AIR*T_ceil)
+        return {'ceiling': ceiling,
+                'M_ceiling_min': self.v_stall(WS, rho_ceil, CL_MAX)/a_ceil,
+                'M_ceiling_max': self.v_max(T, WS, rho_ceil, C_D0, ASPECT_RATIO, e, clip=True)/a_ceil,
+                'stall_max_thrust': h_stall_max,
+                'stall_min_thrust': h_stall_min}
     
     def h_to_rho(self, h_vals):
         return self.ISA(h_vals)[2]
     
     def ISA(self, h):
-        g = 9.80665
-        R = 287
-        T0 = 288.15
-        p0 = 101325
-        rho = 1.225
-        h0 = 0
-
-        layers = [
-            (11000, -0.0065),
-            (20000, 0),
-            (32000, 0.001),
-            (47000, 0.0028),
-            (51000, 0),
-            (71000, -0.0028),
-            (86000, -0.002)]
-
-        for hLimit, a in layers:
-            if h <= h0:
-                break
-
-            h1 = min(h, hLimit)
-            delta_h = h1-h0
-
-            if a == 0:
-                T1 = T0
-                p1 = p0 * np.exp((-g*delta_h/(R*T0)))
-            else:
-                T1 = T0 + a * delta_h
-                p1 = p0 * (T1/T0)**(-g/(a*R))
-
-            T0 = T1
-            p0 = p1
-            h0 = h1
-            
-        density = p0/(R*T0)
-        
-        return T0, p0, density 
+        return self.atmosphere(h)
     
     def plotFE(self, h_min, h_max, h_step):
         h_vals = np.arange(h_min, h_max, h_step)
         
-        T_vals = []
-        rho_vals = []
-    
-        for h in h_vals:
-            T_vals.append(self.ISA(h)[0])
-            rho_vals.append(self.ISA(h)[2])
-            
-        T_vals = np.array(T_vals) # ambient temp vals with altitude
-        rho_vals = np.array(rho_vals) # density vals with altitude
+        T_vals, _, rho_vals = self.ISA(h_vals) # ambient temp and density vals with altitude
         
         v_stall_vals = self.v_stall(WS_CR, rho_vals, CL_MAX) # aerodynamic stall
         v_min_thrust_vals = self.v_min_thrust(TMAX_SL, rho_vals) # vmin due to thrust limit
@@ -97,11 +164,12 @@ class Calc():
         
         # Find extension of M_max
         
-        h_max = np.max(np.where(M_max_vals == np.min(M_max_vals[~np.isnan(M_max_vals)]), h_vals, -100))
+        limits = self.envelope(WS_CR, TMAX_SL)
+        h_max = limits['ceiling']
         print(h_max/0.3048)
         
-        M_start = np.max(np.where(h_vals == h_max, M_stall_vals, -100))
-        M_end = np.min(M_max_vals[~np.isnan(M_max_vals)])
+        M_start = limits['M_ceiling_min']
+        M_end = limits['M_ceiling_max']
         print(M_start, M_end)
         
         plt.rcParams.update({'font.size': 10})
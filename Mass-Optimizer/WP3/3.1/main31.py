@@ -1,7 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from calc import *
+from calc31 import *
 
 if __name__ == '__main__':
     Calc = Calc()
-    Calc.plotFE(0, 4e4, 50)
\ No newline at end of file
+    # Envelope limits of several configurations at once, nan where a configuration has no ceiling (50x wing loading)
+    print(Calc.envelope(WS=np.array([WS_CR, WS_CR*50, WS_CR*0.5]), T=np.array([[TMAX_SL], [TMAX_SL*0.3]])))
+    Calc.plotFE(0, 4e4, 50)
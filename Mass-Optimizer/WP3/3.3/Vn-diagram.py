@@ -1,18 +1,15 @@
 from parameters_weight import *
+from gust import gust_alleviation, gust_velocities, gust_slopes, isa_density
 import matplotlib.pyplot as plt
 import numpy as np
 
-mu_g = 2*(Gw/S) / (rho*c*g*CL_alpha)
-kg = 0.88* mu_g/(5.3 + mu_g)
+# Design cruise point, see gust.critical_gust_cases for sweeps over altitude, weight and speed
+rho = isa_density(h_cr)
+mu_g, kg = gust_alleviation(h_cr, Gw)
 
-UdeB = 84.67 - 0.000933* h_cr
-UdeC = 66.67 - 0.000833*h_cr 
-UdeD = 33.34 - 0.000417* h_cr
+UdeB, UdeC, UdeD = gust_velocities(h_cr)
 
-
-SlopeB = (kg*UdeB*CL_alpha)/(498* Gw/S)
-SlopeC = (kg*UdeC*CL_alpha)/(498* Gw/S)
-SlopeD = (kg*UdeD*CL_alpha)/(498* Gw/S)
+SlopeB, SlopeC, SlopeD = gust_slopes(h_cr, Gw)
 
 
 n_plim = 2.1 + (24000/(W_cr+10000))
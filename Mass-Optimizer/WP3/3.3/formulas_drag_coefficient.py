@@ -34,14 +34,24 @@ def calc_s_wet():
 
     return S_wet, Swet_wing, Swet_fus, Swet_hor, Swet_vert, Swet_nac
 
-# Cf calculations
-def calc_cf():
+# ISA troposphere and lower stratosphere, broadcasts over altitude [m]
+def calc_atmosphere(h):
+    h = np.asarray(h, dtype=float)
+    T = np.where(h < 11000, 288.15 - 0.0065*h, 216.65)
+    p = np.where(h < 11000, 101325*(T/288.15)**5.2559, 22632.06*np.exp(-(h - 11000)/6341.62))
+    rho_h = p/(287.05*T)
+    a = np.sqrt(1.4*287.05*T)
+    mu_h = 1.458e-6*T**1.5/(T + 110.4) # Sutherland
+    return rho_h, a, mu_h
+
+# Cf calculations, defaults are the cruise point of parameters_drag; arrays broadcast
+def calc_cf(M=M, rho=rho, V=V, mu=mu):
     Re_actual = rho*V*l/mu
     Re_cutoff = 44.62*(l/k)**(1.053)*M**1.16
-    Re = min(Re_actual, Re_cutoff)
+    Re = np.minimum(Re_actual, Re_cutoff)
 
-    Cf_laminar = 1.328/m.sqrt(Re)
-    Cf_turbulent = 0.455 / ((m.log10(Re))**2.58*(1+0.144*M**2)**0.65)
+    Cf_laminar = 1.328/np.sqrt(Re)
+    Cf_turbulent = 0.455 / ((np.log10(Re))**2.58*(1+0.144*M**2)**0.65)
 
     Cf_fuselage = 0.1*Cf_laminar + 0.9*Cf_turbulent
     Cf_wing = 0.35*Cf_laminar + 0.65*Cf_turbulent
@@ -51,7 +61,7 @@ def calc_cf():
     return Cf_fuselage, Cf_wing, Cf_tail, Cf_nac
 
 # FF
-def calc_FF():
+def calc_FF(M=M):
     FFwing =(1+(0.6/xc)*(tc)+100*(tc)**4) *(1.34*M**0.18*(m.cos(sweep)**0.28))
     FFhort = (1+(0.6/xct)*(tct)+100*(tct)**4)* (1.34*M**0.18*(m.cos(sweeptail)**0.28))
     FFvertc = (1+(0.6/xcv)*(tcv)+100*(tcv)**4)* (1.34*M**0.18*(m.cos(sweepvtail)**0.28))
@@ -60,24 +70,24 @@ def calc_FF():
     
     return FFwing, FFhort, FFvertc, FFfus, FFnac
 
-def calc_CD0(S_wet_vals, cf_vals, FF_vals, GRDWN):
+# Component breakdown: D/q [m^2] of every part, misc drag as coefficients
+def calc_CD0_components(S_wet_vals, cf_vals, FF_vals, GRDWN, deltaf=deltaf):
     # MAIN DRAG FACTORS 
     S_wet, Swet_wing, Swet_fus, Swet_hor, Swet_vert, Swet_nac = S_wet_vals
     Cf_fuselage, Cf_wing, Cf_tail, Cf_nac = cf_vals
     FFwing, FFhort, FFvertc, FFfus, FFnac = FF_vals
     
-    totalwing = FFwing*Cf_wing*IFwing*Swet_wing
-    totalfus = FFfus*Cf_fuselage*IFfuselage*Swet_fus
-    totalvtail = FFvertc*Cf_tail*IFtail*Swet_vert
-    totalhtail = FFhort*Cf_tail*IFtail*Swet_hor
-    totalnac = FFnac*Cf_nac*IFnac*Swet_nac
-
-    total = totalwing+ totalfus+ totalhtail +totalvtail +totalnac
+    components = {}
+    components['wing'] = FFwing*Cf_wing*IFwing*Swet_wing
+    components['fuselage'] = FFfus*Cf_fuselage*IFfuselage*Swet_fus
+    components['vtail'] = FFvertc*Cf_tail*IFtail*Swet_vert
+    components['htail'] = FFhort*Cf_tail*IFtail*Swet_hor
+    components['nacelle'] = FFnac*Cf_nac*IFnac*Swet_nac
 
     # MISCELLANEOUS DRAG
-    Cd_wavedrag = 0 # no wave drag because M < Mcr
+    components['wave'] = 0 # no wave drag because M < Mcr
     Dq_upsweep = 3.83*u**2.5*Amax
-    Cd_upsweep = Dq_upsweep / Sref # miscellaneous drag due to fuselage upsweep
+    components['upsweep'] = Dq_upsweep / Sref # miscellaneous drag due to fuselage upsweep
     
     # Landing Gear
     Delta_CDS_N = 0.04955*np.exp(5.615*SA_N/SS_N)
@@ -87,21 +97,65 @@ def calc_CD0(S_wet_vals, cf_vals, FF_vals, GRDWN):
     
     Delta_CDREF_TOT = 2*Delta_CDREF_M + Delta_CDREF_N
     
-    if deltaf > 10:
-        Cd_flap = Fflap* (cfc)*(Sflap/Sref)*(deltaf-10) # flaps (misc drag)
-    else: 
-        Cd_flap = 0
-        
-    Cdmisc = Cd_wavedrag + Cd_upsweep + Cd_flap #cd_base, total miscellaneous drag
-    print(Cd_flap)
+    deltaf = np.asarray(deltaf)
+    components['flap'] = np.where(deltaf > 10, Fflap* (cfc)*(Sflap/Sref)*(deltaf-10), 0) # flaps (misc drag)
+    components['gear'] = np.where(GRDWN, Delta_CDREF_TOT, 0)
     
-    if GRDWN:
-        Cdmisc += Delta_CDREF_TOT
+    return components
+
+def calc_CD0(S_wet_vals, cf_vals, FF_vals, GRDWN, deltaf=deltaf, report=True):
+    c = calc_CD0_components(S_wet_vals, cf_vals, FF_vals, GRDWN, deltaf)
+    total = c['wing']+ c['fuselage']+ c['htail'] +c['vtail'] +c['nacelle']
+    Cdmisc = c['wave'] + c['upsweep'] + c['flap'] + c['gear'] #cd_base, total miscellaneous drag
+    if report:
+        print(c['flap'])
     
     # CD0
     Cd0 = (1/Sref*total+Cdmisc)*1.03 # Total Cd0, with 3% of total Cd0 for excrescence and leakage
     
-    print(total/Sref, Cdmisc)
+    if report:
+        print(total/Sref, Cdmisc)
     
     return Cd0
 
+# Drag build-up for arrays of Mach, altitude [m], flap deflection [deg] and gear state, all broadcast together.
+# Returns every component as a CD0 contribution (with the 3% excrescence) and their sum under 'CD0'.
+DRAG_COMPONENTS = ['wing', 'fuselage', 'htail', 'vtail', 'nacelle', 'wave', 'upsweep', 'flap', 'gear']
+
+def calc_drag_buildup(M, h, deltaf=0, GRDWN=False):
+    M = np.asarray(M, dtype=float)
+    rho_h, a, mu_h = calc_atmosphere(h)
+    c = calc_CD0_components(calc_s_wet(), calc_cf(M, rho_h, M*a, mu_h), calc_FF(M), GRDWN, deltaf)
+    shape = np.broadcast_shapes(M.shape, np.shape(h), np.shape(deltaf), np.shape(GRDWN))
+    
+    breakdown = {name: np.broadcast_to(c[name]*(1.03/Sref if name in DRAG_COMPONENTS[:5] else 1.03), shape) for name in DRAG_COMPONENTS}
+    breakdown['CD0'] = sum(breakdown[name] for name in DRAG_COMPONENTS)
+    return breakdown
+
+class DragTable():
+    # CD0 breakdown on a uniform (Mach x altitude) grid for one flap/gear state, bilinear lookup without searching
+    def __init__(self, M_range=(0.1, 0.85), h_range=(0, 15000), shape=(76, 151), deltaf=0, GRDWN=False):
+        self.M_grid = np.linspace(*M_range, shape[0])
+        self.h_grid = np.linspace(*h_range, shape[1])
+        breakdown = calc_drag_buildup(self.M_grid[:, None], self.h_grid[None, :], deltaf, GRDWN)
+        self.names = [*DRAG_COMPONENTS, 'CD0']
+        self.values = np.stack([breakdown[name] for name in self.names]).astype(np.float32) # (components, M, h)
+    
+    def __call__(self, M, h, name='CD0'):
+        # Clamped to the table range
+        values = self.values[self.names.index(name)]
+        x = np.clip((np.asarray(M) - self.M_grid[0])/(self.M_grid[1] - self.M_grid[0]), 0, self.M_grid.size - 1)
+        y = np.clip((np.asarray(h) - self.h_grid[0])/(self.h_grid[1] - self.h_grid[0]), 0, self.h_grid.size - 1)
+        i = np.minimum(x.astype(int), self.M_grid.size - 2)
+        j = np.minimum(y.astype(int), self.h_grid.size - 2)
+        wx, wy = x - i, y - j
+        return ((values[i, j]*(1 - wx) + values[i + 1, j]*wx)*(1 - wy)
+                + (values[i, j + 1]*(1 - wx) + values[i + 1, j + 1]*wx)*wy)
+
+DRAG_TABLES = {} # (deltaf, GRDWN) -> DragTable, built on first use
+
+def lookup_CD0(M, h, deltaf=0, GRDWN=False, name='CD0'):
+    key = (float(deltaf), bool(GRDWN))
+    if key not in DRAG_TABLES:
+        DRAG_TABLES[key] = DragTable(deltaf=deltaf, GRDWN=GRDWN)
+    return DRAG_TABLES[key](M, h, name)
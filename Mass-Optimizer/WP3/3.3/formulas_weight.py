@@ -1,14 +1,17 @@
 from parameters_weight import *
-import math
+import numpy as np
 
-def calc_weight():
+# Class II empty weight [kg] from weights in [lbs]; the defaults are the parameters_weight design, arrays broadcast
+def calc_weight(W_TO=W_TO, W_F=W_F, W_E=W_E, b=b, Lambda_12=Lambda_12, S=S, report=True):
+    W_MZF = W_TO - W_F
     # Wing weight estimation
-    W_W = 0.0017*W_MZF*(b/math.cos(Lambda_12))**0.75*(1 + (6.3*math.cos(Lambda_12)/b)**(1/2))*n_ult**0.55*(b*S/(t_r*W_MZF*math.cos(Lambda_12)))**0.30
-    print(f'Wing weight: {W_W}')
+    W_W = 0.0017*W_MZF*(b/np.cos(Lambda_12))**0.75*(1 + (6.3*np.cos(Lambda_12)/b)**(1/2))*n_ult**0.55*(b*S/(t_r*W_MZF*np.cos(Lambda_12)))**0.30
+    if report:
+        print(f'Wing weight: {W_W}')
     
     # Empennage weight estimation
-    W_h = k_h*S_h*(3.81*(S_h**0.2*V_D)/(1000*(math.cos(Lambda_12_h))**(1/2))-0.287)
-    W_v = k_v*S_v*(3.81*(S_v**0.2*V_D)/(1000*(math.cos(Lambda_12_v))**(1/2))-0.287)
+    W_h = k_h*S_h*(3.81*(S_h**0.2*V_D)/(1000*(np.cos(Lambda_12_h))**(1/2))-0.287)
+    W_v = k_v*S_v*(3.81*(S_v**0.2*V_D)/(1000*(np.cos(Lambda_12_v))**(1/2))-0.287)
     
     W_emp = W_h + W_v
     # Fuselage weight
@@ -59,8 +62,55 @@ def calc_weight():
     
     W_ew = (W_struc + W_sys + W_fur)
     
-    print(W_struc/kg_to_lbs, W_sys/kg_to_lbs)
+    if report:
+        print(W_struc/kg_to_lbs, W_sys/kg_to_lbs)
     
     return W_ew/kg_to_lbs + M_PROP
+
+# MTOW sizing: MTOW = OEW(MTOW, OEW) + payload + fuel fraction*MTOW, iterated on x = (MTOW, OEW) [kg] with Anderson
+# mixing of the last `memory` steps. Planform arguments broadcast, so a whole trade study grid converges in one call.
+M_PAYLOAD = W_TO/kg_to_lbs - W_E/kg_to_lbs - W_F/kg_to_lbs # [kg]
+FUEL_FRACTION = W_F/W_TO
+
+def size_mtow(b=b, Lambda_12=Lambda_12, S=S, payload=M_PAYLOAD, fuel_fraction=FUEL_FRACTION, memory=2, tol=1e-10, maxiter=50):
+    shape = np.broadcast_shapes(*(np.shape(a) for a in (b, Lambda_12, S, payload, fuel_fraction)))
+    b, Lambda_12, S, payload, fuel_fraction = (np.broadcast_to(a, shape).ravel() for a in (b, Lambda_12, S, payload, fuel_fraction))
+    
+    def step(x):
+        MTOW, OEW = x[:, 0], x[:, 1]
+        W_OE = calc_weight(MTOW*kg_to_lbs, fuel_fraction*MTOW*kg_to_lbs, OEW*kg_to_lbs, b, Lambda_12, S, report=False)
+        return np.stack([W_OE + payload + fuel_fraction*MTOW, W_OE], axis=-1)
+    
+    x = np.tile([W_TO/kg_to_lbs, W_E/kg_to_lbs], (b.size, 1))
+    g = step(x)
+    dF, dG = [], [] # residual and map differences, newest last
+    active = np.ones(b.size, dtype=bool)
+    iterations = np.zeros(b.size, dtype=int)
+    
+    for _ in range(maxiter):
+        f = g - x
+        # Every component (MTOW, OEW) must settle, fuel is fuel_fraction*MTOW. nan (diverged) stays active
+        active &= ~(np.abs(f) <= tol*np.abs(x)).all(axis=-1)
+        if not active.any():
+            break
+        iterations += active
+        
+        x_new = np.where(active[:, None], g, x) # plain fixed point step without memory
+        if dF:
+            # Least squares mix of the stored steps for the configurations still iterating
+            F, Gm = np.stack(dF, axis=-1)[active], np.stack(dG, axis=-1)[active] # (configs, 2, m)
+            A = np.einsum('nim,nik->nmk', F, F) + np.eye(len(dF))*(1e-12*np.einsum('nim,nim->n', F, F) + 1e-300)[:, None, None]
+            gamma = np.linalg.solve(A, np.einsum('nim,ni->nm', F, f[active])[..., None])[..., 0]
+            x_new[active] = g[active] - np.einsum('nim,nm->ni', Gm, gamma)
+        
+        g_new = step(x_new)
+        if memory:
+            dF = (dF + [(g_new - x_new) - f])[-memory:]
+            dG = (dG + [g_new - g])[-memory:]
+        x, g = x_new, g_new
+    
+    converged = ~active
+    return {'MTOW': x[:, 0].reshape(shape), 'OEW': x[:, 1].reshape(shape), 'fuel': (fuel_fraction*x[:, 0]).reshape(shape),
+            'iterations': iterations.reshape(shape), 'converged': converged.reshape(shape)}
     
     
\ No newline at end of file
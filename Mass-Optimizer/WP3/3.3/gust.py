@@ -0,0 +1,53 @@
+from parameters_weight import *
+import numpy as np
+
+# Pratt gust load factors (CS/FAR 25.341, imperial units): h [ft], W [lbs], V [KEAS].
+# Every function broadcasts, so a whole altitude x weight x speed grid is one NumPy pass.
+
+RHO_SL = 0.0023769  # sea level density [slug/ft^3]
+GUSTS = ('B', 'C', 'D')
+
+
+def isa_density(h):
+    # ISA density [slug/ft^3], troposphere and isothermal stratosphere up to 65617 ft
+    h = np.asarray(h, dtype=float)
+    T = np.where(h < 36089, 518.67 - 0.00356616*h, 389.97)
+    rho_trop = RHO_SL*(T/518.67)**4.2559
+    rho_strat = 0.00070612*np.exp(-(h - 36089)/20806.7)
+    return np.where(h < 36089, rho_trop, rho_strat)
+
+def gust_velocities(h):
+    # Derived gust velocities Ude [ft/s] for B, C and D on the last axis, constant below 20000 ft
+    h = np.maximum(np.asarray(h, dtype=float), 20000)
+    return np.stack([84.67 - 0.000933*h, 66.67 - 0.000833*h, 33.34 - 0.000417*h], axis=-1)
+
+def gust_alleviation(h, W, S=S, c=c, CL_alpha=CL_alpha):
+    # Mass ratio mu_g and gust alleviation factor kg
+    mu_g = 2*(np.asarray(W)/S) / (isa_density(h)*c*g*CL_alpha)
+    kg = 0.88*mu_g/(5.3 + mu_g)
+    return mu_g, kg
+
+def gust_slopes(h, W, S=S, c=c, CL_alpha=CL_alpha):
+    # dn/dV [1/KEAS] of the B, C and D gust lines on the last axis
+    _, kg = gust_alleviation(h, W, S, c, CL_alpha)
+    return (kg*CL_alpha/(498*np.asarray(W)/S))[..., None]*gust_velocities(h)
+
+def gust_load_factors(h, W, V, S=S, c=c, CL_alpha=CL_alpha):
+    # Positive and negative load factors 1 ± dn, shape broadcast(h, W, V) + (3,) for B, C, D
+    dn = gust_slopes(h, W, S, c, CL_alpha)*np.asarray(V)[..., None]
+    return 1 + dn, 1 - dn
+
+def critical_gust_cases(h, W, V, V_B, V_C=V_CR, V_D=V_D, S=S, c=c, CL_alpha=CL_alpha):
+    # Sweeps every combination of the 1-D altitude, weight and speed arrays. Returns the load factor
+    # envelopes (len(h), len(W), len(V)) and the flight condition of the largest and smallest load factor.
+    # Each gust only acts up to its design speed [KEAS] (B to V_B, C to V_C, D to V_D), speeds past V_D keep n = 1.
+    h, W, V = np.asarray(h, dtype=float), np.asarray(W, dtype=float), np.asarray(V, dtype=float)
+    n_pos, n_neg = gust_load_factors(h[:, None, None], W[None, :, None], V[None, None, :], S, c, CL_alpha)
+    in_band = V[:, None] <= np.array([V_B, V_C, V_D], dtype=float)
+    n_pos, n_neg = np.where(in_band, n_pos, 1), np.where(in_band, n_neg, 1)
+
+    cases = {'n_max': n_pos.max(axis=-1), 'n_min': n_neg.min(axis=-1)}
+    for name, n, pick in (('max', n_pos, np.argmax), ('min', n_neg, np.argmin)):
+        i, j, k, gust = np.unravel_index(pick(n), n.shape)
+        cases[f'critical_{name}'] = {'n': n[i, j, k, gust], 'h': h[i], 'W': W[j], 'V': V[k], 'gust': GUSTS[gust]}
+    return cases
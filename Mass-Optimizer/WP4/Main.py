@@ -58,7 +58,9 @@ def main(debug=False):
                                        pointTorques, 
                                        (0, HALF_SPAN),
                                        subplots=True,
-                                       plot=True)
+                                       plot=True,
+                                       cache=LoadCache(),
+                                       cacheParams=(LOAD_FACTOR, M_WING))
         
     # DEFLECTION CALCULATIONS
     wing_box_points = [(0.2, 0.071507), (0.65, 0.071822), (0.65, -0.021653), (0.2, -0.034334)] # [(x/c,z/c), ...] 
@@ -0,0 +1,60 @@
+import numpy as np
+import hashlib
+import os
+import tempfile
+
+
+class LoadCache():
+    # On-disk cache of internal load distributions (x, M, T, V), one .npy per key; hits are memory-mapped.
+    # The key hashes the given files (XFLR5 data and the calc.py computing the loads) and parameters.
+    # Several processes may share the directory: writes go through a per-process temporary file.
+    def __init__(self, directory='loadCache', maxBytes=256e6):
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+    def key(self, files, *params):
+        h = hashlib.sha256()
+        for file in files:
+            with open(file, 'rb') as f:
+                h.update(f.read())
+        for param in params:
+            h.update(repr(np.asarray(param).tolist() if isinstance(param, np.ndarray) else param).encode())
+        return h.hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            os.utime(path) # mark as recently used
+            return np.load(path, mmap_mode='r')
+        except FileNotFoundError: # missing, or just evicted by another process
+            return None
+
+    def put(self, key, array):
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as f:
+            np.save(f, array)
+        os.replace(f.name, self.path(key))
+        self.evict()
+
+    # Drop least recently used entries until the cache fits in maxBytes
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            try:
+                if name.endswith('.npy'):
+                    path = os.path.join(self.directory, name)
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except FileNotFoundError: # removed by another process meanwhile
+                pass
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.maxBytes:
+            _, size, oldest = entries.pop(0)
+            total -= size
+            try:
+                os.remove(oldest)
+            except FileNotFoundError:
+                pass
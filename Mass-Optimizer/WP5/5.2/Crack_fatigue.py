@@ -1,35 +1,22 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fatigue import cycles_to_failure, critical_crack_length, equivalent_stress_range, spectrum_ranges
+from globalParameters import LOAD_FACTOR
 import numpy as np
 
 #### Paris Law ####
-c = 0.01 * 10 ** -3 #[m]
-k_1c = 26 * 10 ** 6
-Y = 1.1
-sigma = 24 * 10 ** 6 #Placeholder
+sigma_1g = np.array([50, 100, 150]) * 10 ** 6 # 1g stress = ground-air-ground range, PLaceholder
+sigma = sigma_1g * abs(LOAD_FACTOR) # peak stress of the load case
 
 #### c_crit ####
-def c_crit(sigma, k_1c, Y):
-    return k_1c ** 2 / (np.pi * Y ** 2 * sigma ** 2) * 10 ** 3 # [mm]
-
-#### Graphing Paris Law ####
-A = 1.85 * 10 ** -11
-d_sig = 100 * 10 ** 6 # PLaceholder
-
-m = 4.05
-
-def dc(A, Y, d_sig, c, m):
-    return A * (Y * d_sig * np.sqrt(np.pi * c) ) ** m
-
-dc_f = 0
-
-while c <= c_crit(sigma, k_1c, Y):
-
-    dc_f += dc(A, Y, d_sig, c, m)
-
-    c += dc_f
-
-
-
-
+c_crit = critical_crack_length(sigma) # [m]
 
+#### Spectrum ####
+d_sig, counts = spectrum_ranges(sigma_1g) # stress ranges of FATIGUE_SPECTRUM per flight
 
+# Closed-form integral of dc/dN from CRACK_INITIAL to c_crit, for every stress level at once
+N_f = cycles_to_failure(equivalent_stress_range(d_sig, counts), c_crit)/np.sum(counts)
 
+for s, c, n in zip(sigma, c_crit, N_f):
+    print(f'σ_max = {s/1e6:.0f}MPa: c_crit = {c*1e3:.3g}mm, {n:.4g} flights to failure')
@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import scipy as sp
 from Stringer import L_Stringer
+from bucklingCurves import BUCKLING_CURVES, END_FIXITY
+from fatigue import cycles_to_failure, equivalent_stress_range, critical_crack_length, spectrum_ranges
 
 
 class Beam():
@@ -24,25 +26,27 @@ class Beam():
         return np.mean((np.array([z_top1, z_top2]) - y_centroid_stacked)**2, axis=1, keepdims=False), np.mean((np.array([z_bot1, z_bot2]) - y_centroid_stacked)**2, axis=1, keepdims=False)
 
     def define_spanwise_arrays(self, y, posRibs, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom):
+        # Bay arrays may carry leading batch axes, shape (..., nBays); spanwise arrays then become (..., y.size)
         self.posRibs = np.array(posRibs)*HALF_SPAN # [% span] e.g. [0.1, 0.3, 0.5, ...] MUST Have 0 and for root!!!!
-        prev_rib = np.roll(self.posRibs, 1)
-        prev_rib[0] = 0
-        if (prev_rib>self.posRibs).any():
+        prev_rib = np.roll(self.posRibs, 1, axis=-1)
+        prev_rib[..., 0] = 0
+        if (prev_rib.real>self.posRibs.real).any():
             print(f'Found misordered ribs. Trying to fix it.', end='\r')
             self.posRibs = np.maximum(self.posRibs, prev_rib)
-        assert int(posRibs[0]) == 0
-        self.nBays = self.posRibs.shape[0]
-        sectionIDX = np.digitize(y, self.posRibs[1:])
-        self.posRibs = np.concatenate([self.posRibs, np.array([HALF_SPAN])])
+        assert (np.real(posRibs[..., 0]).astype(int) == 0).all()
+        self.nBays = self.posRibs.shape[-1]
+        sectionIDX = np.sum(self.posRibs[..., None, 1:].real <= y[:, None], axis=-1) # np.digitize along the last axis
+        self.posRibs = np.concatenate([self.posRibs, np.full(self.posRibs.shape[:-1] + (1,), HALF_SPAN)], axis=-1)
         
-        self.distRibs = np.array([self.posRibs[i+1] - self.posRibs[i] for i in range(self.nBays)])[sectionIDX]
-        self.nStringersTop = nStringersBayTop[sectionIDX]
-        self.nStringersBottom = nStringersBayBottom[sectionIDX]
-        self.tStringersBay = tStringersBay[sectionIDX*0]
-        self.bStringersBay = bStringersBay[sectionIDX*0]
-        self.hStringersBay = hStringersBay[sectionIDX*0]
-        self.single_stringer_area = self.stringer_object.area[sectionIDX*0]
-        self.single_stringer_Ixx = self.stringer_object.Ixx[sectionIDX*0]
+        take = lambda bayArray, idx: np.take_along_axis(np.asarray(bayArray), idx, axis=-1)
+        self.distRibs = take(np.diff(self.posRibs, axis=-1), sectionIDX)
+        self.nStringersTop = take(nStringersBayTop, sectionIDX)
+        self.nStringersBottom = take(nStringersBayBottom, sectionIDX)
+        self.tStringersBay = take(tStringersBay, sectionIDX*0)
+        self.bStringersBay = take(bStringersBay, sectionIDX*0)
+        self.hStringersBay = take(hStringersBay, sectionIDX*0)
+        self.single_stringer_area = take(self.stringer_object.area, sectionIDX*0)
+        self.single_stringer_Ixx = take(self.stringer_object.Ixx, sectionIDX*0)
 
         self.sectionIDX = sectionIDX
         
@@ -52,7 +56,7 @@ class Beam():
         
     def load_wing_box(self, points, thickness, root_chord, tip_chord, span):
         self.points = points # [(x/c,z/c), ...] 
-        self.thickness = thickness[self.sectionIDX*0]
+        self.thickness = np.take_along_axis(np.asarray(thickness), self.sectionIDX*0, axis=-1)
         self.root_chord = root_chord
         self.tip_chord = tip_chord
         self.span = span
@@ -76,33 +80,32 @@ class Beam():
             self.edge_lengths_list.append(edge_length)
             self.edge_angles_list.append(edge_angle)
 
-        self.centroid = np.zeros((self.sectionIDX.size, 2))
+        self.centroid = np.zeros(self.sectionIDX.shape + (2,), dtype=np.result_type(self.thickness, self.single_stringer_area))
         skin_area = sum(self.edge_lengths_list)*self.thickness
         total_stringer_area = (self.nStringersTop + self.nStringersBottom) * self.single_stringer_area
         for i, c in enumerate(self.edge_centroids_list):
-            self.centroid[:, 0] += c[0] * self.edge_lengths_list[i]*self.thickness / (skin_area+total_stringer_area)
-            self.centroid[:, 1] += c[1] * self.edge_lengths_list[i]*self.thickness / (skin_area+total_stringer_area)
-        self.centroid = self.centroid[self.sectionIDX]
+            self.centroid[..., 0] += c[0] * self.edge_lengths_list[i]*self.thickness / (skin_area+total_stringer_area)
+            self.centroid[..., 1] += c[1] * self.edge_lengths_list[i]*self.thickness / (skin_area+total_stringer_area)
 
         # [(0.2, 0.071507), (0.65, 0.071822), (0.65, -0.021653), (0.2, -0.034334)]
         z_top1 = self.points[0][1]
         z_top2 = self.points[1][1]
         z_bot1 = self.points[3][1]
         z_bot2 = self.points[2][1]
-        self.centroid[:, 1] = self.nStringersTop * (z_top1+z_top2)/2 * self.single_stringer_area / (skin_area+total_stringer_area)
-        self.centroid[:, 1] = self.nStringersBottom * (z_bot1+z_bot2)/2 * self.single_stringer_area / (skin_area+total_stringer_area)
+        self.centroid[..., 1] = self.nStringersTop * (z_top1+z_top2)/2 * self.single_stringer_area / (skin_area+total_stringer_area)
+        self.centroid[..., 1] = self.nStringersBottom * (z_bot1+z_bot2)/2 * self.single_stringer_area / (skin_area+total_stringer_area)
 
         self.Ixx_base_wingbox = 0
         self.Izz_base_wingbox = 0
         for i, c in enumerate(self.edge_centroids_list):
             self.Ixx_base_wingbox += (
                 self.thickness * self.edge_lengths_list[i]**3 * np.sin(self.edge_angles_list[i])**2 / 12 # main component
-                + self.edge_lengths_list[i] * self.thickness * (c-self.centroid)[:, 1]**2                   # parallel axis component
+                + self.edge_lengths_list[i] * self.thickness * (c-self.centroid)[..., 1]**2                   # parallel axis component
                 )
 
             self.Izz_base_wingbox += (
                 self.thickness * self.edge_lengths_list[i]**3 * np.cos(self.edge_angles_list[i])**2 / 12 # main component
-                + self.edge_lengths_list[i] * self.thickness * (c-self.centroid)[:, 0]**2                   # parallel axis component
+                + self.edge_lengths_list[i] * self.thickness * (c-self.centroid)[..., 0]**2                   # parallel axis component
                 )
             
         self.Ixz = 0
@@ -113,7 +116,8 @@ class Beam():
     
     def get_displacement(self, data, E=E, disable=False):
         s = self.intg_points
-        y, M = data[:, 0], data[:, 1]
+        # data may stack load cases, shape (..., y.size, 2); the spanwise stations are shared by all of them
+        y, M = data.reshape(-1, *data.shape[-2:])[0, :, 0], data[..., 1]
         c = self.get_chord(y)
         # raise RuntimeError('Multiply by stringer count???')
 
@@ -154,13 +158,13 @@ class Beam():
     def get_twist(self, data, G, disable=False):
         s = self.intg_points
         a, b, c, d = self.points # Order matters
-        chord = self.get_chord(data[:, 0])
+        y = data.reshape(-1, *data.shape[-2:])[0, :, 0]
+        chord = self.get_chord(y)
         self.Areas = (a[1]-d[1]+b[1]-c[1])/2*(c[0]-d[0]) * chord**2
         integral = chord*sum(self.edge_lengths_list)/self.thickness
         self.J = 4*self.Areas**2 / (integral)
 
-        y = data[:, 0]
-        torque = data[:, 1]
+        torque = data[..., 1]
         dtheta_dy = torque/(self.J*G)
 
         if disable:
@@ -175,27 +179,32 @@ class Beam():
 
         return self.theta
 
-    def get_mass(self, y):
+    def get_mass(self, y, rule='simpson'):
         # y = np.linspace(0, self.span/2, self.intg_points)
+        # rule='trapezoid' is exact for the piecewise linear area on grids that have a station either side of each rib
         chord = self.get_chord(y)
         skin_area = sum(self.edge_lengths_list)*self.thickness*chord
         total_stringer_area = (self.nStringersTop + self.nStringersBottom) * self.single_stringer_area
 
         # integrand = sp.interpolate.interp1d(y, skin_area+total_stringer_area, kind='cubic', fill_value="extrapolate")
         # self.volume = sp.integrate.quad(integrand, 0, self.span/2)[0] # type: ignore
-        self.volume = sp.integrate.simpson(skin_area+total_stringer_area, y) #type:ignore
+        integrate = sp.integrate.trapezoid if rule == 'trapezoid' else sp.integrate.simpson
+        self.area = skin_area+total_stringer_area
+        self.volume = integrate(self.area, x=y) #type:ignore
         self.mass = self.volume*density
 
         # print(f'Volume: {self.volume:.4g} m³')
         return self.mass
 
     def report_stats(self):
-        print(f'Deflected {self.v[-1]:.4g}m | Allowed {0.15*self.span:.4g}m')
-        print(f'Twisted {self.theta[-1]*180/np.pi:.4g}° | Allowed {10.0:.4g}°')
+        # Worst tip value over any stacked load cases
+        v_tip = self.v[..., -1].flat[np.argmax(np.abs(self.v[..., -1]))]
+        theta_tip = self.theta[..., -1].flat[np.argmax(np.abs(self.theta[..., -1]))]
+        print(f'Deflected {v_tip:.4g}m | Allowed {0.15*self.span:.4g}m')
+        print(f'Twisted {theta_tip*180/np.pi:.4g}° | Allowed {10.0:.4g}°')
 
     def konstantinos_konstantinopoulos(self, y, M, T=0, report=False):
-        num_points = M.size
-        self.normal_stress = np.empty((num_points, 4))
+        self.normal_stress = np.empty(np.broadcast_shapes(M.shape, self.Ixx_list.shape) + (4,), dtype=np.result_type(M, self.Ixx_list))
         chord = self.get_chord(y)
 
         for i, p in enumerate(self.points):
@@ -204,7 +213,7 @@ class Beam():
             z = z_c * chord
             
             # self.normal_stress[:, i] = ((0*self.Ixx_list - M * self.Ixz)*x + (M*self.Izz - 0 * self.Ixz)*z) / (self.Ixx_list*self.Izz - self.Ixz**2)
-            self.normal_stress[:, i] = M*z / self.Ixx_list
+            self.normal_stress[..., i] = M*z / self.Ixx_list
         if report:
             print(f'Max tensile: {np.max(self.normal_stress)/1e6:.0f}MPa, max compressive: {np.min(self.normal_stress)/1e6:.0f}MPa')
 
@@ -224,7 +233,7 @@ class Beam():
         torsionShearStress = T/(2*self.Areas*self.thickness)
 
         # This gives the maximum shear stress in the section, which should occur in the front spar.
-        return np.array([forceShearStress+torsionShearStress, forceShearStress-torsionShearStress]).T
+        return np.stack([forceShearStress+torsionShearStress, forceShearStress-torsionShearStress], axis=-1)
         
     # FAILURE STRESS CALCULATIONS
     def getFailureStresses(self, y):
@@ -239,14 +248,14 @@ class Beam():
         # Compressive
         skinBuckStressCrit = self.skinBuckStress(y, self.distRibs)
         colBuckStressCrit = self.colBuckStress(self.distRibs)
-        compYieldCrit = np.full_like(y, SIGMA_Y_COMP)
+        compYieldCrit = np.full(self.thickness.shape, SIGMA_Y_COMP)
         
         # Tensile
-        tensYieldCrit = np.full_like(y, SIGMA_Y_TENS)
-        crackPropStressCrit = np.full_like(y, self.crackPropStress())  
+        tensYieldCrit = np.full(self.thickness.shape, SIGMA_Y_TENS)
+        crackPropStressCrit = np.full(self.thickness.shape, self.crackPropStress())  
 
-        stressStack = np.hstack([shearBuckStressCrit, skinBuckStressCrit, colBuckStressCrit[:, None], compYieldCrit[:, None], tensYieldCrit[:, None], crackPropStressCrit[:, None]])
-        return np.min(stressStack, axis=1), stressStack    
+        stressStack = np.concatenate([shearBuckStressCrit, skinBuckStressCrit, colBuckStressCrit[..., None], compYieldCrit[..., None], tensYieldCrit[..., None], crackPropStressCrit[..., None]], axis=-1)
+        return np.min(stressStack, axis=-1), stressStack    
 
     # Shear Buckling - this is a shear stress!!
     def shearBuckStress(self, y, rib_spacing):
@@ -254,20 +263,19 @@ class Beam():
         hRearSpar = abs(self.points[1][1] - self.points[2][1])*self.get_chord(y)
         heights = np.array([hFrontSpar, hRearSpar]).T
 
-        a_b = rib_spacing[:, None]/heights
+        a_b = rib_spacing[..., None]/heights
 
         k_s = self.ShearBucklingInterpolation(a_b)
 
-        t = self.thickness[:, None]
+        t = self.thickness[..., None]
         
         tau = np.pi**2 * k_s * E / (12*(1-POISSON_RATIO**2)) * (t/heights)**2
             
         return tau # shape(y.size, 2) for both spars
     
     def ShearBucklingInterpolation(self, a_b, plot=False):
-        x_data=[1.00, 1.17, 1.50, 1.750, 2.00, 2.50, 3.0, 4.0, 5.0]
-        y_data=[15.0, 13.0, 11.6, 10.84, 10.4, 9.84, 9.7, 9.5, 9.53]
-        f=sp.interpolate.interp1d(x_data, y_data, kind='cubic', bounds_error=False, fill_value=(15, 9.53))
+        f = BUCKLING_CURVES['shear']
+        x_data, y_data = f.x_data, f.y_data
 
         if plot:
             x_plt=np.arange(np.min(x_data)-1, np.max(x_data)+10, 0.001)
@@ -288,21 +296,20 @@ class Beam():
     
     # Skin buckling
     def skinBuckStress(self, y, rib_spacing):
-        t = self.thickness[:, None]
+        t = self.thickness[..., None]
         chord = self.get_chord(y)
         edges = np.array(self.edge_lengths_list)
-        b = np.outer(chord, edges)
-        b[:, 0] /= self.nStringersTop
-        b[:, 2] /= self.nStringersBottom
-        sigma = np.pi**2*self.SkinBucklingInterpolation(rib_spacing[:, None]/b)*E / (12*(1-POISSON_RATIO**2)) * (t/b)**2
-        sigma[:, 1] = np.inf
-        sigma[:, 3] = np.inf
+        b = np.broadcast_to(np.outer(chord, edges), self.nStringersTop.shape + (4,)).astype(np.result_type(chord, self.nStringersTop, self.nStringersBottom))
+        b[..., 0] /= self.nStringersTop
+        b[..., 2] /= self.nStringersBottom
+        sigma = np.pi**2*self.SkinBucklingInterpolation(rib_spacing[..., None]/b)*E / (12*(1-POISSON_RATIO**2)) * (t/b)**2
+        sigma[..., 1] = np.inf
+        sigma[..., 3] = np.inf
         return sigma
     
     def SkinBucklingInterpolation(self, a_b, plot=False):
-        x_data=[0.7,  0.85, 1.0, 1.15, 1.3, 1.67, 2.0, 2.2, 2.5, 2.75, 3.0, 3.2, 3.35, 3.70, 4.18, 4.66, 4.8, 5.0]
-        y_data=[10.7, 8.16, 6.8, 6.17, 5.8, 5.6,  4.9, 4.7, 4.6, 4.70, 4.5, 4.4, 4.4,  4.45, 4.27, 4.35, 4.3, 4.3]
-        f=sp.interpolate.interp1d(x_data, y_data, kind='cubic', bounds_error=False, fill_value=(10.7, 4.3))
+        f = BUCKLING_CURVES['skin']
+        x_data, y_data = f.x_data, f.y_data
 
         if plot:
             x_plt=np.arange(np.min(x_data)-1, np.max(x_data)+10, 0.001)
@@ -325,8 +332,8 @@ class Beam():
         return f(a_b)
     
     # Column Buckling - normal stress
-    def colBuckStress(self, L):
-        K = K_CC
+    def colBuckStress(self, L, fixity='CC'):
+        K = END_FIXITY[fixity]
         A = self.single_stringer_area
         I = self.Ixx_list
         return (K * np.pi**2 * E * I)/(L**2 * A)
@@ -370,6 +377,15 @@ class Beam():
     
     def crackPropStress(self):
         return K_1C/np.sqrt(np.pi*CRACK_LENGTH)
+
+    # Fatigue Crack Growth
+    def fatigueLife(self, sigma_ref, sigma_max, spectrum=FATIGUE_SPECTRUM):
+        # Flights for a crack to grow from CRACK_INITIAL to the critical length at the peak stress sigma_max of the load case,
+        # spectrum as (range/sigma_ref, cycles) with sigma_ref the 1g stress
+        safe = lambda sigma: sigma - sigma.real + np.maximum(sigma.real, 1e-8) # unloaded stations never fail, complex-step safe
+        sigma_ref, sigma_max = safe(np.asarray(sigma_ref)), safe(np.asarray(sigma_max))
+        delta_sigma, counts = spectrum_ranges(sigma_ref, spectrum)
+        return cycles_to_failure(equivalent_stress_range(delta_sigma, counts), critical_crack_length(sigma_max))/np.sum(counts)
     
     # PLOTTING
     def plot(self):
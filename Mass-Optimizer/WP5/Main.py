@@ -2,9 +2,17 @@ from Beam import *
 from calc import *
 from globalParameters import *
 from Stringer import *
+from evalCache import EvalCache
+from telemetry import Telemetry, worker_path
+from checkpoint import Checkpoint
+from surrogate import Surrogate
+from fatigue import fatigue_margin
 from plotSafetyMargin import plotFailureMargin
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import os
+import sys
 import warnings
 
 STRINGER_FACTOR = 1e5
@@ -12,6 +20,15 @@ iterList = []
 stressList = []
 stressList2 = []
 iters = 1
+show_progress = True
+telemetry = Telemetry() # disabled until optimise_main is given a telemetry path
+CHECKPOINT_PATH = 'checkpoint.npz' # used by --checkpoint and --resume
+surrogate = None # Surrogate used by calc_mass_screened, set by optimise_main
+adaptive_grid = None # number of uniform base stations of the adaptive grid, None keeps the load grid
+fatigue = False # add the crack growth life to the tension margins, set by optimise_main
+
+WING_BOX = {'points': [(0.2, 0.071507), (0.65, 0.071822), (0.65, -0.021653), (0.2, -0.034334)], # [(x/c,z/c), ...] 
+            'root_chord': 2.85, 'tip_chord': 1.03, 'span': 17.29}
 
 order_of_mag = np.array([[1e-2, 1e-2, 1e-2, 1e-2, 1e-2, 1e-1, 1e-1]])
 
@@ -46,109 +63,597 @@ def x_from_print():
     
     return x.T.flatten()
 
-def calc_mass(x):
+def real_min(a):
+    # np.min over the last axis, but ordered on the real part only, so inf/complex margins don't turn into nan
+    idx = np.argmin(a.real, axis=-1)
+    return np.take_along_axis(a, idx[..., None], axis=-1)[..., 0]
+
+def real_absmax(a, axis=0):
+    # Entry of largest magnitude (by real part) along axis, sign kept
+    idx = np.argmax(np.abs(a.real), axis=axis)
+    return np.take_along_axis(a, np.expand_dims(idx, axis), axis=axis).squeeze(axis)
+
+def calc_mass(x, report=True):
+    # x is one design (63,) or a population of designs (P, 63)
     global bay_count
-    bay_count = x.size//7
-    x = x.reshape(7, bay_count) * order_of_mag.T
-    posRibs, tSkinBay, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom = x
-    
-    posRibs = np.array(posRibs)
-    tStringersBay = np.array(tStringersBay)
-    tSkinBay = np.array(tSkinBay)
-    bStringersBay = np.array(bStringersBay)
-    hStringersBay = np.array(hStringersBay)
-    nStringersBayTop = np.array(nStringersBayTop)
-    nStringersBayBottom = np.array(nStringersBayBottom)
+    telemetry.start()
+    batch_shape = x.shape[:-1]
+    bay_count = x.shape[-1]//7
+    posRibs = x[..., :bay_count] * order_of_mag[0, 0]
     
-    wing_box_points = [(0.2, 0.071507), (0.65, 0.071822), (0.65, -0.021653), (0.2, -0.034334)] # [(x/c,z/c), ...] 
-
-    stringer_instance = L_Stringer(bStringersBay, hStringersBay, tStringersBay)
-    wb = Beam(stringers=stringer_instance, intg_points=865)
-    wb.define_spanwise_arrays(y_data, posRibs, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom)
-    wb.load_wing_box(points=wing_box_points, thickness=tSkinBay, root_chord=2.85, tip_chord=1.03, span=17.29)
-    v = wb.get_displacement(np.vstack((y_data, M_data)).T, E, False)
-    theta = wb.get_twist(np.vstack((y_data, T_data)).T, G, False)
-    wb.get_mass(y_data)
+    # Stations: the uniform load grid, or an adaptive grid refined at the ribs and load features
+    y, M, T, V = get_adaptive_loads(posRibs.real) if adaptive_grid else (y_data, M_data, T_data, V_data)
+    telemetry.stage('loads')
+
+    wb = build_beam(x, y)
+    telemetry.stage('section')
+
+    # Stacked load cases (C, N) get a leading case axis ahead of the design batch axes
+    multi_case = M.ndim > 1
+    M, T, V = (np.reshape(a, a.shape[:-1] + (1,)*len(batch_shape) + a.shape[-1:]) for a in (M, T, V))
+
+    v = wb.get_displacement(np.stack(np.broadcast_arrays(y, M), axis=-1), E, False)
+    theta = wb.get_twist(np.stack(np.broadcast_arrays(y, T), axis=-1), G, False)
+    wb.get_mass(y, rule='trapezoid' if adaptive_grid else 'simpson')
+    telemetry.stage('deflection')
     
+    margins = get_station_margins(wb, y, M, V, T)
+    constr = get_constraints(margins, v, theta, posRibs, batch_shape, multi_case)
+    minMarginShear, minMarginComp, minMarginTens = constr[..., 0], constr[..., 1], constr[..., 2]
+
+    if batch_shape:
+        report = False
+
+    if report and show_progress and iters % 100 == 0:
+        print(f'Optimising ({iters})| {wb.mass:.1f}kg/{wb.volume:.3g}m³, Shear Margin: {minMarginShear:.3g}, Comp Margin: {minMarginComp:.3g}, Tens Margin: {minMarginTens:.3g}', end='\r')
+
+    if report and show_progress and iters % 500 == 0:
+        arr = x.reshape(7, bay_count).T * order_of_mag
+        print('\n', np.array2string(arr, formatter={'float_kind':lambda v: f"{v:.4g}"}, separator=', '))
+        wb.report_stats()
+
+    telemetry.record(kind='batch' if batch_shape else 'cs' if np.iscomplexobj(x) else 'value', iter=iters, mass=wb.mass, constraints=constr,
+                     cache_hits=calc_mass_cached.hits, cache_misses=calc_mass_cached.misses)
+    return wb.mass, constr
+
+def build_beam(x, y):
+    # Beam with the sections of one design (63,) or a population (P, 63) on the stations y
+    batch_shape = x.shape[:-1]
+    posRibs, tSkinBay, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom = np.moveaxis(x.reshape(*batch_shape, 7, x.shape[-1]//7) * order_of_mag.T, -2, 0)
+
+    wb = Beam(stringers=L_Stringer(bStringersBay, hStringersBay, tStringersBay), intg_points=y.size)
+    wb.define_spanwise_arrays(y, posRibs, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom)
+    wb.load_wing_box(thickness=tSkinBay, **WING_BOX)
+    return wb
+
+def get_station_margins(wb, y, M, V, T):
+    # Margins at every station of a loaded Beam: shear (..., N, 2), compression (..., N, 6), tension (..., N, 2)
     # Applied Stresses
-    normalStressAppliedTens = np.tile(np.maximum(0, np.max(wb.konstantinos_konstantinopoulos(y_data, M_data), axis=1, keepdims=True)), (1,2))
-    normalStressAppliedComp = np.tile(np.minimum(0, np.min(wb.konstantinos_konstantinopoulos(y_data, M_data), axis=1, keepdims=True)), (1,6))
+    normalStressAppliedTens = np.tile(np.maximum(0, np.max(wb.konstantinos_konstantinopoulos(y, M), axis=-1, keepdims=True)), (1,2))
+    normalStressAppliedComp = np.tile(np.minimum(0, np.min(wb.konstantinos_konstantinopoulos(y, M), axis=-1, keepdims=True)), (1,6))
 
-    shearStressApplied = wb.getShearStress(y_data, V_data, T_data)
+    shearStressApplied = wb.getShearStress(y, V, T)
+    telemetry.stage('stresses')
     
     # Critical Stresses
-    stressStack = wb.getFailureStresses(y_data)[1]
-    critStressArrayShear = stressStack[:, :2] # width 2
-    critStressArrayComp = stressStack[:, 2:8] # width 6
-    critStressArrayTens = stressStack[:, 8:] # width 2 
+    stressStack = wb.getFailureStresses(y)[1]
+    telemetry.stage('failure')
+    critStressArrayShear = stressStack[..., :2] # width 2
+    critStressArrayComp = stressStack[..., 2:8] # width 6
+    critStressArrayTens = stressStack[..., 8:] # width 2 
 
     modes = ['shearBuckStress', 'shearBuckStress', *['skinBuckStress' for _ in range(4)], 'colBuckStress', 'compYield', 'tensYield', 'crackPropStress']
     
     # Stress Margins
-    marginArrayShear = critStressArrayShear/(shearStressApplied+1e-8)
+    marginArrayShear = critStressArrayShear/(shearStressApplied*np.sign(shearStressApplied.real)+1e-8) # shear buckling is sign-independent (complex-step safe abs)
     marginArrayComp = critStressArrayComp/(-normalStressAppliedComp+1e-8)
     marginArrayTens = critStressArrayTens/(normalStressAppliedTens+1e-8)
 
-    minMarginShear = np.min(marginArrayShear)
-    minMarginComp = np.min(marginArrayComp)
-    argmin_comp = np.argmin(marginArrayComp, axis=1)[0]
-    minMarginTens = np.min(marginArrayTens)
-    
+    if fatigue:
+        # 1g stress of every load case drives the spectrum, its peak stress sets the critical crack length
+        load_factors = np.abs(np.reshape([n for _, n, _ in LOAD_CASES], (-1,) + (1,)*(M.ndim-1))) if M_data.ndim > 1 else abs(LOAD_FACTOR)
+        marginFatigue = fatigue_margin(wb.fatigueLife(normalStressAppliedTens[..., 0]/load_factors, normalStressAppliedTens[..., 0]))
+        marginArrayTens = np.concatenate([marginArrayTens, marginFatigue[..., None]], axis=-1)
+
     # deltaArrayShear = critStressArrayShear - shearStressApplied
     # deltaArrayComp = critStressArrayComp - normalStressAppliedComp
     # deltaArrayTens = critStressArrayTens - normalStressAppliedTens
 
-    rolled_ribs = np.roll(posRibs, -1)
+    return marginArrayShear, marginArrayComp, marginArrayTens
+
+def get_constraints(margins, v, theta, posRibs, batch_shape=(), multi_case=False):
+    # Worst case: fold the case axis in with the stations
+    if multi_case:
+        margins = (np.moveaxis(a, 0, -3) for a in margins)
+    minMarginShear, minMarginComp, minMarginTens = (real_min(a.reshape(*batch_shape, -1)) for a in margins)
+
+    rolled_ribs = np.roll(posRibs, -1, axis=-1)
     diff = rolled_ribs-posRibs
-    diff[-1] = np.inf
-    min_dist = np.min(diff)
+    diff[..., -1] = np.inf
+    min_dist = np.min(diff, axis=-1)
 
-    if iters % 100 == 0:
-        print(f'Optimising ({iters})| {wb.mass:.1f}kg/{wb.volume:.3g}m³, Shear Margin: {minMarginShear:.3g}, Comp Margin: {minMarginComp:.3g}, Tens Margin: {minMarginTens:.3g}', end='\r')
+    v_tip, theta_tip = v[..., -1], theta[..., -1]
+    if multi_case:
+        v_tip, theta_tip = real_absmax(v_tip), real_absmax(theta_tip)
 
-    if iters % 500 == 0:
-        arr = x.reshape(7, bay_count).T
-        print('\n', np.array2string(arr, formatter={'float_kind':lambda v: f"{v:.4g}"}, separator=', '))
-        wb.report_stats()
-    
-    return wb.mass, np.array([minMarginShear, minMarginComp, minMarginTens, np.min([minMarginShear,minMarginComp,minMarginTens]), v[-1], theta[-1]*180/np.pi, min_dist])
+    minMargin = real_min(np.stack([minMarginShear, minMarginComp, minMarginTens], axis=-1))
+    constr = np.stack([minMarginShear, minMarginComp, minMarginTens, minMargin, v_tip, theta_tip*180/np.pi, min_dist], axis=-1)
+    telemetry.stage('margins')
+    return constr
+
+def calc_mass_jac(x, h=1e-30):
+    # Complex-step derivatives of the mass and of all constraint outputs. Every column is
+    # exact to machine precision, and one complex analysis gives the same column of both.
+    # All columns go through calc_mass as one (n, n) batch of probes, the incremental analysis takes them one by one.
+    x = np.asarray(x, dtype=float)
+    if not incremental:
+        mass, constr = calc_mass(x + 1j*h*np.eye(x.size), report=False)
+        return np.imag(mass)/h, np.imag(constr).T/h
+
+    dmass = np.empty(x.size)
+    dconstr = np.empty((7, x.size))
+    for i in range(x.size):
+        x_complex = x.astype(complex)
+        x_complex[i] += 1j*h
+        mass, constr = incremental_analysis(x_complex)
+        dmass[i] = np.imag(mass)/h
+        dconstr[:, i] = np.imag(constr)/h
+
+    return dmass, dconstr
+
+class IncrementalAnalysis():
+    def __init__(self):
+        # Station results of a reference design. A design that differs from it only in bays 1..n-1 recomputes
+        # the stations of those bays and the global integrals; anything else becomes the new reference.
+        self.x = None
+
+    def changed_bays(self, x):
+        # None when a change reaches every station: rib positions, or bay 0 whose stringer and skin sizes are used along the span
+        if self.x is None or x.shape != self.x.shape:
+            return None
+        diff = (x != self.x).reshape(7, -1)
+        if diff[0].any() or diff[1:, 0].any():
+            return None
+        return np.flatnonzero(diff[1:].any(axis=0))
+
+    def stations(self, x, y, M, T, V):
+        wb = build_beam(x, y)
+        wb.get_displacement(np.stack(np.broadcast_arrays(y, M), axis=-1), E, True)
+        wb.get_twist(np.stack(np.broadcast_arrays(y, T), axis=-1), G, True)
+        wb.get_mass(y, rule='trapezoid' if adaptive_grid else 'simpson')
+        return {'sectionIDX': wb.sectionIDX, 'I': wb.Ixx_list, 'J': wb.J, 'area': wb.area}, get_station_margins(wb, y, M, V, T)
+
+    def set_reference(self, x):
+        posRibs = x[:x.size//7]*order_of_mag[0, 0]
+        self.loads = get_adaptive_loads(posRibs) if adaptive_grid else (y_data, M_data, T_data, V_data)
+        self.x = np.array(x)
+        self.props, self.margins = self.stations(self.x, *self.loads)
+
+    def __call__(self, x):
+        # Same outputs as calc_mass for a single design, complex-step probes included
+        telemetry.start()
+        if self.changed_bays(x.real) is None:
+            self.set_reference(x.real)
+        y, M, T, V = self.loads
+
+        bays = self.changed_bays(x)
+        props, margins = self.props, self.margins
+        mask = np.isin(props['sectionIDX'], bays) if bays is not None else None
+        if bays is None: # complex probe of a rib position or of bay 0
+            props, margins = self.stations(x, y, M, T, V)
+        elif mask.any():
+            # Splice the stations of the changed bays into copies, the reference stays untouched
+            sub_props, sub_margins = self.stations(x, y[mask], M[..., mask], T[..., mask], V[..., mask])
+            props = {k: props[k].astype(np.result_type(props[k], sub_props[k])) for k in props}
+            margins = [a.astype(np.result_type(a, b)) for a, b in zip(margins, sub_margins)]
+            for k in props:
+                props[k][..., mask] = sub_props[k]
+            for a, b in zip(margins, sub_margins):
+                a[..., mask, :] = b
+        telemetry.stage('stations')
+
+        # Global quantities from the station values, as in Beam.get_displacement, get_twist and get_mass
+        dv_dy = sp.integrate.cumulative_trapezoid(y=-M/(E*props['I']), x=y, initial=0)
+        v = sp.integrate.cumulative_trapezoid(y=dv_dy, x=y, initial=0)
+        theta = sp.integrate.cumulative_trapezoid(T/(props['J']*G), y, initial=0)
+        integrate = sp.integrate.trapezoid if adaptive_grid else sp.integrate.simpson
+        mass = integrate(props['area'], x=y)*density
+
+        constr = get_constraints(margins, v, theta, x[:x.size//7]*order_of_mag[0, 0], multi_case=M.ndim > 1)
+        telemetry.record(kind='incremental', iter=iters, mass=mass, constraints=constr, changed_bays=None if bays is None else bays.tolist())
+        return mass, constr
+
+incremental_analysis = IncrementalAnalysis()
+incremental = False # route single-design analyses through incremental_analysis, set by optimise_main
+
+def analyse(x):
+    # Single designs go through the incremental analysis when it is enabled
+    if incremental and x.ndim == 1:
+        return incremental_analysis(x)
+    return calc_mass(x)
+
+# Objective and constraints share one analysis per unique design vector
+calc_mass_cached = EvalCache(analyse, maxsize=256)
+calc_mass_jac_cached = EvalCache(calc_mass_jac, maxsize=16)
 
 def mass_wrap(x):
     global iters
     iters += 1
     # print(calcVol(x)[0])
-    return calc_mass(x)[0]
+    return calc_mass_cached(x)[0]
 
 def constr_wrap(x):
     # print(calcVol(x)[1].shape)
-    return calc_mass(x)[1]
+    return calc_mass_cached(x)[1]
 
-def optimise_main():
-    global y_data, M_data, T_data, V_data, T_data
-    global initial_x
-    
-    if not False:
-        warnings.simplefilter('ignore', category=UserWarning)
+def mass_jac_wrap(x):
+    return calc_mass_jac_cached(x)[0]
+
+def constr_jac_wrap(x):
+    return calc_mass_jac_cached(x)[1]
+
+def get_violation(constr):
+    return np.max(np.maximum(np.subtract(CONSTR_LB, constr), np.subtract(constr, CONSTR_UB)).clip(0), axis=-1)
+
+def calc_mass_screened(x):
+    # Batch evaluation (P, 63) that skips designs the surrogate is confident are infeasible, those get the predicted values
+    if surrogate is None:
+        return calc_mass(x, report=False)
 
+    x = np.atleast_2d(x)
+    mass, constr = np.empty(len(x)), np.empty((len(x), 7))
+    skip = np.zeros(len(x), dtype=bool)
+    if surrogate.ready:
+        mass_pred, constr_pred = surrogate.predict(x)
+        skip = surrogate.confidently_infeasible(constr_pred, CONSTR_LB, CONSTR_UB)
+        mass[skip], constr[skip] = mass_pred[skip], constr_pred[skip]
+
+    if (~skip).any():
+        mass[~skip], constr[~skip] = calc_mass(x[~skip], report=False)
+        if surrogate.ready:
+            surrogate.record_error(constr_pred[~skip], constr[~skip])
+        surrogate.add(x[~skip], mass[~skip], constr[~skip])
+    surrogate.screened += skip.sum()
+    return mass, constr
+
+# Objective and constraints of a population share one batch analysis, keyed on the population array
+calc_mass_screened_cached = EvalCache(calc_mass_screened, maxsize=4)
+
+# Population-vectorized wrappers for differential_evolution(vectorized=True): x has shape (63, S)
+def mass_wrap_vec(x):
+    global iters
+    if x.ndim > 1 and x.shape[-1] == 0: # no feasible trial vectors this generation
+        return np.empty(0)
+    iters += x.shape[-1] if x.ndim > 1 else 1
+    return calc_mass_screened_cached(x.T)[0]
+
+def constr_wrap_vec(x):
+    if x.ndim > 1 and x.shape[-1] == 0:
+        return np.empty((7, 0))
+    return calc_mass_screened_cached(x.T)[1].T
+
+LOAD_CACHE = LoadCache()
+
+CONSTR_LB = [1, 1, 1, 1, -0.15*HALF_SPAN*2, -10.0, 0.01]
+CONSTR_UB = [np.inf, np.inf, np.inf, 1.1, 0.15*HALF_SPAN*2, 10.0, np.inf]
+
+def get_internal_loads(V=V_CR, n=LOAD_FACTOR, name=ARRAY_PATH):
     # EXTERNAL LOADING
     calc = Calc(r'WP4\WP4_1\dataa0.txt', r'WP4\WP4_1\dataa10.txt')
-    calc.set_load_case_from_flight(LOAD_FACTOR, W_MTOW)
+    calc.set_load_case_from_flight(n, W_MTOW, V=V)
 
-    aeroLoading, inertialLoading, torsionLoading = lambda x: calc.totalLoading(x, LOAD_FACTOR, M_WING)[0], lambda x: calc.totalLoading(x, LOAD_FACTOR, M_WING)[1], lambda x: calc.totalLoading(x, LOAD_FACTOR, M_WING)[3]
+    aeroLoading, inertialLoading, torsionLoading = lambda x: calc.totalLoading(x, n, M_WING)[0], lambda x: calc.totalLoading(x, n, M_WING)[1], lambda x: calc.totalLoading(x, n, M_WING)[3]
     loadingDist = lambda x: calc.findLoadingDist(x)
-    pointLoads, pointTorques = (lambda x: calc.totalLoading(x, LOAD_FACTOR, M_WING)[2])(0), (lambda x: calc.totalLoading(x, LOAD_FACTOR, M_WING)[4])(0)
+    pointLoads, pointTorques = (lambda x: calc.totalLoading(x, n, M_WING)[2])(0), (lambda x: calc.totalLoading(x, n, M_WING)[4])(0)
     
     # INTERNAL LOADING
-    y_data, M_data, T_data, V_data = calc.plot(aeroLoading,
-                                       inertialLoading, 
-                                       torsionLoading, 
-                                       loadingDist, 
-                                       pointLoads, 
-                                       NULL_ARRAY_2, 
-                                       pointTorques, 
-                                       (0, HALF_SPAN),
-                                       subplots=True,
-                                       plot=False)
+    return calc.plot(aeroLoading,
+                     inertialLoading, 
+                     torsionLoading, 
+                     loadingDist, 
+                     pointLoads, 
+                     NULL_ARRAY_2, 
+                     pointTorques, 
+                     (0, HALF_SPAN),
+                     subplots=True,
+                     plot=False,
+                     name=name,
+                     cache=LOAD_CACHE,
+                     cacheParams=(n, M_WING))
+
+def get_all_internal_loads(cases=LOAD_CASES):
+    # Loads for every case on the same spanwise grid; M, T and V are stacked to shape (len(cases), N)
+    loads = [get_internal_loads(V, n, name) for V, n, name in cases]
+    y = loads[0][0]
+    return y, *(np.vstack([l[i] for l in loads]) for i in range(1, 4))
+
+def set_internal_loads(loads, progress=True, grid=None):
+    # Also used by the process pool initializer, so workers see the same loads
+    global y_data, M_data, T_data, V_data, show_progress, load_features, adaptive_grid
+    y_data, M_data, T_data, V_data = loads
+    load_features = get_load_features(*loads)
+    adaptive_grid = grid
+    show_progress = progress
+    warnings.simplefilter('ignore', category=UserWarning)
+
+def get_load_features(y, M, T, V, factor=10):
+    # Stations where a load kinks, jumps or peaks (point loads, shear reversals), independent of the design
+    features = [y[0], y[-1]]
+    for a in (M, T, V):
+        a = np.reshape(a, (-1, y.size))
+        curvature = np.abs(np.diff(a, 2, axis=-1))
+        kinks = np.flatnonzero((curvature > factor*np.median(curvature, axis=-1, keepdims=True)).any(axis=0)) + 1
+        peaks = np.flatnonzero((np.diff(np.sign(np.diff(a, axis=-1)), axis=-1) != 0).any(axis=0)) + 1
+        features += [y[kinks], y[peaks]]
+    return np.unique(np.concatenate([np.atleast_1d(f) for f in features]))
+
+def get_adaptive_loads(posRibs):
+    # Coarse uniform stations plus the load features and a station either side of every rib (all designs of a batch),
+    # since the section is piecewise constant between ribs. Loads are interpolated linearly from the load grid.
+    ribs = np.unique(posRibs)*HALF_SPAN
+    eps = 1e-6*HALF_SPAN
+    y = np.unique(np.concatenate([np.linspace(y_data[0], y_data[-1], adaptive_grid), load_features, ribs, ribs[ribs > eps] - eps]))
+    y = y[(y >= y_data[0]) & (y <= y_data[-1])]
+    if y.size >= y_data.size: # large batches with scattered ribs gain nothing
+        return y_data, M_data, T_data, V_data
+
+    idx = np.clip(np.searchsorted(y_data, y, side='right') - 1, 0, y_data.size-2)
+    w = (y - y_data[idx])/(y_data[idx+1] - y_data[idx])
+    interp = lambda a: a[..., idx]*(1-w) + a[..., idx+1]*w
+    return y, interp(M_data), interp(T_data), interp(V_data)
+
+def get_bounds(bays=9):
+    # posRibs, tSkinBay, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom = x
+    ones = np.ones(bays)
+    return sp.optimize.Bounds((np.array([0*ones, 1e-3*ones,     1e-3*ones,     1e-2*ones,     1e-2*ones,     2*ones,   2*ones])/order_of_mag.T).flatten(), 
+                              (np.array([ones,   10e-3*ones, 10e-3*ones, 10e-2*ones, 10e-2*ones, 100*ones, 100*ones])/order_of_mag.T).flatten(),
+                              keep_feasible=False)
+
+def run_trust_constr(x0, gradient='cs', callback=None):
+    # gradient: 'cs' for complex-step derivatives, '2-point' for scipy finite differences
+    if gradient == 'cs':
+        jac, constr_jac = mass_jac_wrap, constr_jac_wrap
+    else:
+        jac, constr_jac = None, gradient
+
+    constraints_sigma = sp.optimize.NonlinearConstraint(constr_wrap, jac=constr_jac, lb=CONSTR_LB, ub=CONSTR_UB, keep_feasible=False)
+    bounds_x = get_bounds(x0.size//7)
+    
+    return sp.optimize.minimize(mass_wrap, x0, method='trust-constr', jac=jac, bounds=bounds_x, constraints=constraints_sigma, callback=callback) # type:ignore | options = {"gtol": 1e-8}
+
+def get_start_points(n_starts, x0, sampling='lhs', spread=0.2, seed=None):
+    # First start is always x0. 'lhs' fills the bounds with a Latin hypercube, 'perturb' scatters around x0.
+    bounds_x = get_bounds(x0.size//7)
+    bays = x0.size//7
+    rng = np.random.default_rng(seed)
+
+    if sampling == 'lhs':
+        sample = sp.stats.qmc.LatinHypercube(d=x0.size, seed=rng).random(n_starts-1)
+        starts = bounds_x.lb + sample*(bounds_x.ub - bounds_x.lb)
+    else:
+        starts = x0*(1 + spread*rng.standard_normal((n_starts-1, x0.size)))
+        starts = np.clip(starts, bounds_x.lb, bounds_x.ub)
+
+    # Ribs must be ordered and start at the root
+    starts[:, :bays] = np.sort(starts[:, :bays], axis=1)
+    starts[:, 0] = 0
+
+    return np.vstack([x0, starts])
+
+def stringer_index(bays=9):
+    # Positions of nStringersBayTop and nStringersBayBottom in x
+    return np.arange(5*bays, 7*bays)
+
+def get_roundings(x, n_random=4, seed=None):
+    # Integer stringer counts around a continuous design: nearest, all up, top or bottom up, and randomized floor/ceil mixes
+    bays = x.size//7
+    idx = stringer_index(bays)
+    scale = order_of_mag[0, 5]
+    n = x[idx]*scale
+    lo, hi, nearest = np.floor(n), np.ceil(n), np.round(n)
+    top = np.arange(idx.size) < bays
+    rng = np.random.default_rng(seed)
+
+    counts = [nearest, hi, np.where(top, hi, nearest), np.where(top, nearest, hi)]
+    counts += [np.where(rng.random(idx.size) < n - lo, hi, lo) for _ in range(n_random)]
+    counts = np.unique(np.clip(counts, 2, 100), axis=0)
+
+    starts = np.tile(x, (len(counts), 1))
+    starts[:, idx] = counts/scale
+    return starts
+
+def section_index(bays=9):
+    # Positions of tStringersBay, bStringersBay and hStringersBay in x
+    return np.arange(2*bays, 5*bays)
+
+def snap_stringers(x, catalog):
+    # Replaces every bay's stringer by the lightest catalog L section with at least the same Ixx, picked among the
+    # sections inside the design variable bounds so the re-solve starts feasible w.r.t. the bounds
+    bays = x.size//7
+    rows = x.reshape(7, bays) * order_of_mag.T
+    bounds = get_bounds(bays)
+    lb, ub = (np.reshape(a, (7, bays)) * order_of_mag.T for a in (bounds.lb, bounds.ub))
+    dims = ((2, 'thickness'), (3, 'base'), (4, 'height'))
+    idx = catalog.lightest(L_Stringer(rows[3], rows[4], rows[2]).Ixx, 'L', {k: (lb[i, 0], ub[i, 0]) for i, k in dims})
+    if (idx < 0).any():
+        print(f'No catalog section within bounds is stiff enough for bays {np.flatnonzero(idx < 0)}, keeping them')
+    found = idx >= 0
+    for i, k in dims:
+        rows[i, found] = np.clip(catalog.get(idx[found])[k], lb[i, found], ub[i, found]) # float32 sizes sit a rounding error off the bounds
+    return (rows/order_of_mag.T).flatten()
+
+def run_fixed(x0, gradient='cs', fixed=None, maxiter=1000):
+    # trust-constr over the remaining variables only, the fixed ones (default: stringer counts) stay as they are in x0
+    fixed = stringer_index(x0.size//7) if fixed is None else fixed
+    free = np.setdiff1d(np.arange(x0.size), fixed)
+    def expand(z):
+        x = x0.copy()
+        x[free] = z
+        return x
+
+    if gradient == 'cs':
+        jac, constr_jac = lambda z: mass_jac_wrap(expand(z))[free], lambda z: constr_jac_wrap(expand(z))[:, free]
+    else:
+        jac, constr_jac = None, gradient
+
+    constraints_sigma = sp.optimize.NonlinearConstraint(lambda z: constr_wrap(expand(z)), jac=constr_jac, lb=CONSTR_LB, ub=CONSTR_UB, keep_feasible=False)
+    bounds_x = get_bounds(x0.size//7)
+    bounds_free = sp.optimize.Bounds(bounds_x.lb[free], bounds_x.ub[free], keep_feasible=False)
+
+    optim = sp.optimize.minimize(lambda z: mass_wrap(expand(z)), x0[free], method='trust-constr', jac=jac, bounds=bounds_free, constraints=constraints_sigma, options={'maxiter': maxiter}) # type:ignore
+    optim.x = expand(optim.x)
+    return optim
+
+def get_boundary_samples(x_feasible, samples, steps=4):
+    # Bisects the segments from a feasible design towards each sample (all segments in one batch per step), so the
+    # training set gets points on both sides of the feasible boundary, where the constrained optimum lies
+    samples = np.atleast_2d(samples)
+    lo, hi = np.zeros(len(samples)), np.ones(len(samples))
+    X, masses, constrs = [], [], []
+    for _ in range(steps):
+        t = (lo + hi)/2
+        x = x_feasible + t[:, None]*(samples - x_feasible) # ribs stay ordered, the root rib at 0
+        mass, constr = calc_mass(x, report=False)
+        feasible = get_violation(constr) <= 1e-6
+        lo, hi = np.where(feasible, t, lo), np.where(feasible, hi, t)
+        X.append(x)
+        masses.append(mass)
+        constrs.append(constr)
+    return np.vstack(X), np.concatenate(masses), np.vstack(constrs)
+
+def run_surrogate(x0, maxiter=100, seed=None, tol=1e-6, spread=0.05):
+    # Surrogate-assisted optimization: fit on designs scattered around x0 (by spread) plus points bisected towards the feasible
+    # boundary, then repeatedly minimise the predicted mass subject to the predicted constraints (cheap) from the best
+    # feasible design, inside a trust region of the size of spread, and run the full analysis only at that candidate.
+    # A candidate predicted or found infeasible is replaced by boundary points between it and the best feasible design
+    # (the search falls back to that design) and halves the trust region, an improving candidate doubles it.
+    bays = x0.size//7
+    bounds_x = get_bounds(bays)
+    samples = get_start_points(max(surrogate.min_points - len(surrogate.X), 2), x0, sampling='perturb', spread=spread, seed=seed)
+    mass, constr = calc_mass(samples, report=False)
+    X, masses, violations = list(samples), list(mass), list(get_violation(constr))
+    surrogate.add(samples, mass, constr)
+
+    def add(x, m, c):
+        surrogate.add(x, m, c)
+        X.extend(np.atleast_2d(x))
+        masses.extend(np.atleast_1d(m))
+        violations.extend(np.atleast_1d(get_violation(c)))
+
+    best = lambda: min(range(len(X)), key=lambda i: (violations[i] > tol, violations[i] if violations[i] > tol else masses[i]))
+    if violations[0] <= tol:
+        add(*get_boundary_samples(x0, samples[1:][np.array(violations[1:len(samples)]) > tol]))
+
+    radius = spread
+    for i in range(maxiter):
+        b = best()
+        x_best = X[b]
+        step = radius*np.maximum(np.abs(x_best), 1e-3*(bounds_x.ub - bounds_x.lb))
+        region = sp.optimize.Bounds(np.maximum(bounds_x.lb, x_best - step), np.minimum(bounds_x.ub, x_best + step))
+        constraints_pred = sp.optimize.NonlinearConstraint(lambda x: surrogate.predict(x)[1][0], lb=CONSTR_LB, ub=CONSTR_UB)
+        candidate = sp.optimize.minimize(lambda x: surrogate.predict(x)[0][0], x_best, method='SLSQP', bounds=region, constraints=constraints_pred, options={'maxiter': 50}).x
+        candidate[:bays] = np.sort(candidate[:bays])
+        candidate[0] = 0
+
+        predicted = get_violation(surrogate.predict(candidate)[1])[0] <= tol
+        feasible_known = violations[best()] <= tol
+        if predicted or not feasible_known:
+            m, c = calc_mass(candidate, report=False)
+            surrogate.record_error(surrogate.predict(candidate)[1], c)
+            add(candidate, m, c)
+        if feasible_known and (not predicted or violations[-1] > tol):
+            add(*get_boundary_samples(x_best, candidate))
+        radius = min(2*radius, 4*spread) if best() != b else radius/2
+
+        if show_progress:
+            print(f'Surrogate ({i+1}/{maxiter})| candidate {"infeasible (predicted)" if not predicted else f"{masses[-1]:.1f}kg, violation {violations[-1]:.3g}"} | best {masses[best()]:.1f}kg', end='\r')
+
+    b = best()
+    improved = violations[b] <= tol and (violations[0] > tol or masses[b] < masses[0])
+    if not improved:
+        b = 0
+    return sp.optimize.OptimizeResult(x=X[b], fun=masses[b], success=improved, constr_violation=violations[b], nit=maxiter,
+                                      message='Best analysed design of the surrogate-assisted search' if improved else 'No analysed design improved on x0, returning x0')
+
+def multi_start_worker(x0, gradient='cs'):
+    optim = run_trust_constr(x0, gradient)
+    telemetry.flush()
+    return {'x': optim.x, 'fun': optim.fun, 'success': optim.success, 'constr_violation': optim.constr_violation, 'nit': optim.nit, 'message': optim.message,
+            'telemetry': telemetry.path}
+
+def mixed_integer_worker(x0, gradient='cs'):
+    optim = run_fixed(x0, gradient)
+    telemetry.flush()
+    return {'x': optim.x, 'fun': optim.fun, 'success': optim.success, 'constr_violation': optim.constr_violation, 'nit': optim.nit, 'message': optim.message,
+            'telemetry': telemetry.path}
+
+def init_worker(loads, telemetry_path=None, grid=None, bay_local=False, fatigue_life=False):
+    # Each worker process writes its own telemetry file, merged into telemetry_path by run_multi_start
+    global telemetry, incremental, fatigue
+    set_internal_loads(loads, progress=False, grid=grid)
+    incremental = bay_local
+    fatigue = fatigue_life
+    telemetry = Telemetry(None if telemetry_path is None else worker_path(telemetry_path, os.getpid()))
+
+def run_multi_start(starts, loads, gradient='cs', workers=None, telemetry_path=None, worker=multi_start_worker):
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(loads, telemetry_path, adaptive_grid, incremental, fatigue)) as pool:
+        results = list(pool.map(worker, starts, [gradient]*len(starts)))
+    telemetry.merge(sorted({r['telemetry'] for r in results if r['telemetry']}))
+    return results
+
+def report_multi_start(results, tol=1e-6, label='Multi-start'):
+    masses = np.array([r['fun'] for r in results])
+    feasible = np.array([r['constr_violation'] <= tol for r in results])
+
+    print(f'\n{label}: {feasible.sum()}/{len(results)} feasible')
+    for i, r in enumerate(results):
+        print(f'Start {i:3d} | {r["fun"]:8.2f}kg | violation {r["constr_violation"]:.3g} | {r["nit"]} iterations | {"feasible" if feasible[i] else "infeasible"}')
+
+    if not feasible.any():
+        return min(results, key=lambda r: r['constr_violation'])
+
+    feasible_masses = masses[feasible]
+    print(f'Feasible mass: best {np.min(feasible_masses):.2f}kg, median {np.median(feasible_masses):.2f}kg, worst {np.max(feasible_masses):.2f}kg, std {np.std(feasible_masses):.2f}kg')
+    return results[np.flatnonzero(feasible)[np.argmin(feasible_masses)]]
+
+def optimise_main(gradient='cs', method='trust-constr', n_starts=1, workers=None, sampling='lhs', popsize=15, maxiter=1000, seed=None, all_cases=False, telemetry_path=None,
+                  checkpoint_path=None, checkpoint_every=10, resume=False, integer_stringers=False, n_roundings=4, screening=False, grid=None, bay_local=False, fatigue_life=False,
+                  catalog_stringers=False, catalog_maxiter=200):
+    # method: 'trust-constr' (local, from x_from_print()), 'differential_evolution' (global, population-vectorized)
+    # or 'surrogate' (minimise an RBF fit of the analysis, run the full analysis only at its optima, maxiter of them)
+    # screening lets differential_evolution skip trial designs the surrogate is confident are infeasible
+    # grid=n analyses on n uniform stations refined at the ribs and load features instead of the full load grid
+    # bay_local recomputes only the stations of the changed bays for gradient probes (IncrementalAnalysis)
+    # fatigue_life makes FATIGUE_FLIGHTS of crack growth under FATIGUE_SPECTRUM a tension margin
+    # catalog_stringers snaps the stringers to standard L extrusions (StringerCatalog) and re-solves the rest in at most
+    # catalog_maxiter iterations, keeping the design before snapping if the re-solve ends infeasible
+    # n_starts > 1 runs trust-constr from x_from_print() plus n_starts-1 sampled starts in a process pool
+    # all_cases sizes against the worst margin over every case in LOAD_CASES instead of the active case only
+    # telemetry_path records every evaluation (stage timings, mass, constraints, cache counters) to .jsonl or .npz
+    # checkpoint_path gets the current iterate, best design and counters every checkpoint_every iterations (None disables),
+    # resume restarts from the best design stored there (CHECKPOINT_PATH if none given) instead of x_from_print(),
+    # or only reports it if that run had finished
+    # integer_stringers rounds the stringer counts of the continuous optimum several ways and re-solves the
+    # remaining continuous variables for each rounding in parallel, returning the best feasible integer design
+    global initial_x, telemetry, iters, surrogate, incremental, fatigue
+    incremental = bay_local
+    fatigue = fatigue_life
+    telemetry = Telemetry(telemetry_path)
+    surrogate = Surrogate(get_bounds()) if screening or method == 'surrogate' else None
+    calc_mass_screened_cached.clear() # screened results depend on the surrogate and the loads of this run
+    checkpoint_path = checkpoint_path or (CHECKPOINT_PATH if resume else None)
+    checkpoint = Checkpoint(checkpoint_path, checkpoint_every) if checkpoint_path else None
+
+    def checkpoint_callback(intermediate_result):
+        checkpoint.extra['iters'] = iters
+        checkpoint(intermediate_result)
+    callback = checkpoint_callback if checkpoint else None
+    
+    if not False:
+        warnings.simplefilter('ignore', category=UserWarning)
+
+    loads = get_all_internal_loads() if all_cases else get_internal_loads()
+    set_internal_loads(loads, grid=grid)
     
     # OPTIMIZATION
     # posRibs, tSkinBay, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom = x
@@ -159,26 +664,59 @@ def optimise_main():
     # print(initial_x.reshape(7, 9).T * order_of_mag)
     # initial_x = (np.array([posRibs, 4e-3*ones, 2.7e-3*ones, 3e-2*ones, 3e-2*ones, np.linspace(20, 5, 9), np.linspace(20, 5, 9)])/order_of_mag.T).flatten()
 
-    
-    constraints_sigma = sp.optimize.NonlinearConstraint(constr_wrap, lb=[1, 1, 1, 1, -0.15*HALF_SPAN*2, -10.0, 0.01], ub=[np.inf, np.inf, np.inf, 1.1, 0.15*HALF_SPAN*2, 10.0, np.inf], keep_feasible=False)
-    bounds_x = sp.optimize.Bounds((np.array([0*ones, 1e-3*ones,     1e-3*ones,     1e-2*ones,     1e-2*ones,     2*ones,   2*ones])/order_of_mag.T).flatten(), 
-                                  (np.array([ones,   10e-3*ones, 10e-3*ones, 10e-2*ones, 10e-2*ones, 100*ones, 100*ones])/order_of_mag.T).flatten(),
-                                  keep_feasible=False)
-    
-    optim = sp.optimize.minimize(mass_wrap, initial_x, method='trust-constr', bounds=bounds_x, constraints=constraints_sigma, ) # type:ignore | options = {"gtol": 1e-8}
+    if resume:
+        stored = checkpoint.resume() if checkpoint else None
+        if stored is None:
+            print(f'No checkpoint at {checkpoint_path}, starting from x_from_print()')
+        elif stored.get('finished', False):
+            print(f'{checkpoint_path} holds a finished run ({checkpoint.nit} iterations), reporting its best design')
+            telemetry.close()
+            report_result(sp.optimize.OptimizeResult(x=checkpoint.x_best, fun=checkpoint.fun_best, success=checkpoint.violation_best <= checkpoint.tol,
+                                                     constr_violation=checkpoint.violation_best, message='Finished run restored from checkpoint'))
+            return
+        else:
+            initial_x = checkpoint.x_best # the best feasible design, not the last iterate
+            iters = int(stored.get('iters', iters))
+            print(f'Resuming from {checkpoint_path}: iteration {checkpoint.nit}, best {checkpoint.fun_best:.2f}kg (violation {checkpoint.violation_best:.3g})')
+
+    if method == 'differential_evolution':
+        constraints_vec = sp.optimize.NonlinearConstraint(constr_wrap_vec, lb=CONSTR_LB, ub=CONSTR_UB)
+        optim = sp.optimize.differential_evolution(mass_wrap_vec, get_bounds(), constraints=constraints_vec, x0=initial_x, popsize=popsize, maxiter=maxiter, 
+                                                   seed=seed, vectorized=True, updating='deferred', polish=False, disp=True, callback=callback) # type:ignore
+    elif method == 'surrogate':
+        optim = run_surrogate(initial_x, maxiter=maxiter, seed=seed)
+    elif n_starts > 1:
+        starts = get_start_points(n_starts, initial_x, sampling=sampling, seed=seed)
+        optim = sp.optimize.OptimizeResult(report_multi_start(run_multi_start(starts, loads, gradient, workers, telemetry_path)))
+    else:
+        optim = run_trust_constr(initial_x, gradient, callback)
     # optim = sp.optimize.shgo(volWrap, bounds=bounds_x, constraints=constraints_sigma) # type:ignore
 
-    raw_result = optim.x
+    if integer_stringers:
+        roundings = get_roundings(optim.x, n_roundings, seed)
+        results = run_multi_start(roundings, loads, gradient, workers, telemetry_path, worker=mixed_integer_worker)
+        optim = sp.optimize.OptimizeResult(report_multi_start(results, label='Integer stringer counts'))
+
+    if catalog_stringers:
+        bays = optim.x.size//7
+        fixed = np.concatenate([section_index(bays), stringer_index(bays)]) if integer_stringers else section_index(bays)
+        snapped = run_fixed(snap_stringers(optim.x, StringerCatalog()), gradient, fixed, maxiter=catalog_maxiter)
+        mass, constr = calc_mass_cached(snapped.x)
+        violation = get_violation(constr)
+        if violation > 1e-6:
+            print(f'\nCatalog stringers: re-solve infeasible ({mass:.2f}kg, violation {violation:.3g}), keeping the design before snapping ({optim.fun:.2f}kg)')
+        else:
+            print(f'\nCatalog stringers: {mass:.2f}kg, {mass - optim.fun:+.2f}kg relative to the design before snapping')
+            optim = snapped
+
+    telemetry.close()
+    if checkpoint:
+        checkpoint.finish(optim, iters=iters)
     print('')
-    print("Success:", optim.success)
-    print("Status:", optim.status)
-    print("Message:", optim.message)
-    print("Constraint violation:", optim.constr_violation)
-    print("Optimality:", optim.optimality)
-    print('\nResults:')
-    arr = raw_result.reshape(7, bay_count).T * order_of_mag
-    print(np.array2string(arr, formatter={'float_kind':lambda v: f"{v:.4g}"}, separator=', '))
-    print(constr_wrap(raw_result))
+    calc_mass_cached.report_stats()
+    if surrogate is not None:
+        surrogate.report_stats()
+    report_result(optim)
 
     
     # print(stressList[0].shape)
@@ -189,5 +727,17 @@ def optimise_main():
     # # plt.plot(np.linspace(0, 1, maxMarginArray.shape[0]), maxMarginArray)
     # plt.show()
 
+def report_result(optim):
+    raw_result = optim.x
+    print("Success:", optim.success)
+    print("Status:", optim.get('status'))
+    print("Message:", optim.message)
+    print("Constraint violation:", optim.constr_violation)
+    print("Optimality:", optim.get('optimality'))
+    print('\nResults:')
+    arr = raw_result.reshape(7, raw_result.size//7).T * order_of_mag
+    print(np.array2string(arr, formatter={'float_kind':lambda v: f"{v:.4g}"}, separator=', '))
+    print(constr_wrap(raw_result))
+
 if __name__ == '__main__':
-    optimise_main() 
+    optimise_main(checkpoint_path=CHECKPOINT_PATH if '--checkpoint' in sys.argv else None, resume='--resume' in sys.argv) 
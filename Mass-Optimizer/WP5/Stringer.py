@@ -1,9 +1,35 @@
 import matplotlib.pyplot as plt
 import numpy as np
+import os
 import scipy as sp
+from abc import ABC, abstractmethod
 from scipy import interpolate
 
-class L_Stringer():
+class Section(ABC):
+    # Thin-walled section built from rectangles (x0, z0, width, height), every dimension may be an array.
+    # z upwards, x to the right, properties about the centroid.
+    @abstractmethod
+    def rectangles(self):
+        pass
+
+    def get_properties(self):
+        rects = self.rectangles()
+        areas = [w*h for _, _, w, h in rects]
+        self.area = sum(areas)
+        self.x_c = sum(A*(x0 + w/2) for A, (x0, _, w, _) in zip(areas, rects))/self.area
+        self.z_c = sum(A*(z0 + h/2) for A, (_, z0, _, h) in zip(areas, rects))/self.area
+        self.centroid = np.array([self.x_c, self.z_c])
+
+        self.Ixx = sum(w*h**3/12 + A*(z0 + h/2 - self.z_c)**2 for A, (_, z0, w, h) in zip(areas, rects))
+        self.Izz = sum(h*w**3/12 + A*(x0 + w/2 - self.x_c)**2 for A, (x0, _, w, h) in zip(areas, rects))
+        self.Ixz = sum(A*(x0 + w/2 - self.x_c)*(z0 + h/2 - self.z_c) for A, (x0, z0, w, h) in zip(areas, rects))
+
+    def get_I_at_angle(self, alpha):
+        # alpha is measured from the horizontal
+        return self.Ixx*np.cos(alpha)**2 + self.Izz*np.sin(alpha)**2 - 2*self.Ixz*np.cos(alpha)*np.sin(alpha)
+
+
+class L_Stringer(Section):
     def __init__(self, base, height, thickness):
         self.base = base # m
         self.height = height # m
@@ -32,9 +58,125 @@ class L_Stringer():
           + 0 + (self.base-self.thickness)*self.thickness * ((self.thickness+self.base)/2-self.x_c)*(self.thickness/2-self.z_c)
         )
 
-    def get_I_at_angle(self, alpha):
-        # alpha is measured from the horizontal
-        I = self.Ixx*np.cos(alpha)**2 + self.Izz*np.sin(alpha)**2 - 2*self.Ixz*np.cos(alpha)*np.sin(alpha)
+    def rectangles(self):
+        return [(0, 0, self.thickness, self.height), (self.thickness, 0, self.base-self.thickness, self.thickness)]
+
+
+class Z_Stringer(Section):
+    def __init__(self, base, height, thickness):
+        # Web of height, flanges of base pointing opposite ways. Origin bottom left of the web.
+        self.base = base # m
+        self.height = height # m
+        self.thickness = thickness # m
+        self.get_properties()
+
+    def rectangles(self):
+        t, b, h = self.thickness, self.base, self.height
+        return [(-(b-t), 0, b-t, t), (0, 0, t, h), (t, h-t, b-t, t)]
+
+
+class T_Stringer(Section):
+    def __init__(self, base, height, thickness):
+        # Flange of base on the skin, web of height on its middle
+        self.base = base # m
+        self.height = height # m
+        self.thickness = thickness # m
+        self.get_properties()
+
+    def rectangles(self):
+        t, b, h = self.thickness, self.base, self.height
+        return [(0, 0, b, t), ((b-t)/2, t, t, h-t)]
+
+
+class Hat_Stringer(Section):
+    def __init__(self, base, height, thickness, flange=None):
+        # Crown of base, two webs of height and two skin flanges (base/2 by default)
+        self.base = base # m
+        self.height = height # m
+        self.thickness = thickness # m
+        self.flange = base/2 if flange is None else flange # m
+        self.get_properties()
+
+    def rectangles(self):
+        t, b, h, f = self.thickness, self.base, self.height, self.flange
+        return [(0, 0, f, t), (f, 0, t, h), (f+t, h-t, b-2*t, t), (f+b-t, 0, t, h), (f+b, 0, f, t)]
+
+
+SECTIONS = {'L': L_Stringer, 'Z': Z_Stringer, 'T': T_Stringer, 'hat': Hat_Stringer}
+
+# Standard extrusion sizes [mm]
+CATALOG_SIZES = [10, 12, 15, 16, 20, 25, 30, 35, 40, 45, 50, 60, 70, 80]
+CATALOG_THICKNESSES = [0.8, 1.0, 1.2, 1.5, 1.6, 2.0, 2.5, 3.0, 4.0, 5.0]
+
+
+class StringerCatalog():
+    def __init__(self, path='stringerCatalog.npz'):
+        # Properties of every standard section, loaded from path (built and saved on first use).
+        # Sorted on Ixx with a running minimum of the area from the top, so the lightest section with enough Ixx
+        # is a binary search. A k-d tree on (log area, log Ixx) gives the nearest section to any pair.
+        self.path = path
+        if not os.path.exists(path):
+            np.savez_compressed(path, **self.build())
+        with np.load(path) as f:
+            self.table = {k: f[k] for k in f.files}
+
+        order = np.argsort(self.table['Ixx'])
+        self.table = {k: v[order] for k, v in self.table.items()}
+        self.lightest_index = {} # (shape, bounds) -> suffix_lightest of the allowed sections
+        self.tree = sp.spatial.cKDTree(np.column_stack([np.log(self.table['area']), np.log(self.table['Ixx'])]))
+
+    def suffix_lightest(self, mask):
+        # Entry i is the lightest allowed section at or above position i of the Ixx order, -1 past the stiffest one
+        area = np.where(mask, self.table['area'], np.inf)[::-1]
+        positions = np.arange(area.size)
+        best = np.maximum.accumulate(np.where(area == np.minimum.accumulate(area), positions, 0))
+        best = (area.size - 1 - best)[::-1]
+        return np.append(np.where(np.isfinite(self.table['area'][best]) & mask[best], best, -1), -1)
+
+    @staticmethod
+    def build():
+        b, h, t = np.meshgrid(CATALOG_SIZES, CATALOG_SIZES, CATALOG_THICKNESSES, indexing='ij')
+        b, h, t = (a.flatten()*1e-3 for a in (b, h, t))
+        valid = (2*t < b) & (2*t < h)
+        b, h, t = b[valid], h[valid], t[valid]
+
+        columns = {k: [] for k in ('shape', 'base', 'height', 'thickness', 'area', 'Ixx', 'Izz', 'Ixz')}
+        for code, (name, section) in enumerate(SECTIONS.items()):
+            stringer = section(b, h, t)
+            for k, v in (('shape', np.full(b.size, code, dtype=np.int8)), ('base', b), ('height', h), ('thickness', t),
+                         ('area', stringer.area), ('Ixx', stringer.Ixx), ('Izz', stringer.Izz), ('Ixz', stringer.Ixz)):
+                columns[k].append(v)
+        return {k: np.concatenate(v).astype(np.int8 if k == 'shape' else np.float32) for k, v in columns.items()}
+
+    def __len__(self):
+        return self.table['area'].size
+
+    def shape_names(self, idx):
+        return np.array(list(SECTIONS))[self.table['shape'][idx]]
+
+    def allowed(self, shape=None, bounds=None):
+        # Sections of one shape (all if None) whose dimensions lie within bounds {'thickness': (lo, hi), ...} [m],
+        # with a float32 tolerance so sizes exactly on a bound count as inside
+        mask = np.ones(len(self), dtype=bool) if shape is None else self.table['shape'] == list(SECTIONS).index(shape)
+        for k, (lo, hi) in (bounds or {}).items():
+            mask &= (self.table[k] >= lo*(1 - 1e-6)) & (self.table[k] <= hi*(1 + 1e-6))
+        return mask
+
+    def lightest(self, Ixx_min, shape=None, bounds=None):
+        # Index of the lightest allowed section with at least Ixx_min, -1 where no allowed section is stiff enough
+        key = (shape, None if bounds is None else tuple(sorted((k, tuple(v)) for k, v in bounds.items())))
+        if key not in self.lightest_index:
+            self.lightest_index[key] = self.suffix_lightest(self.allowed(shape, bounds))
+        pos = np.searchsorted(self.table['Ixx'], np.asarray(Ixx_min), side='left')
+        return np.where(pos < len(self), self.lightest_index[key][np.minimum(pos, len(self) - 1)], -1)
+
+    def nearest(self, area, Ixx):
+        # Index of the section closest to (area, Ixx) in relative terms
+        return self.tree.query(np.column_stack([np.log(np.ravel(area)), np.log(np.ravel(Ixx))]))[1].reshape(np.shape(area))
+
+    def get(self, idx):
+        return {k: v[idx] for k, v in self.table.items()}
+
 
 if __name__ == '__main__':
     stringer = L_Stringer(5/100, 3/100, 1/1000)
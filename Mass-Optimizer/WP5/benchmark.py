@@ -0,0 +1,138 @@
+from Main import *
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+
+STAGES = ['define_spanwise_arrays', 'load_wing_box', 'get_displacement', 'get_twist', 'get_mass',
+          'konstantinos_konstantinopoulos', 'getShearStress', 'getFailureStresses']
+
+
+def resample_loads(loads, n_points):
+    # Interpolates y, M, T, V (stacked cases allowed) onto n_points equally spaced stations
+    y, M, T, V = loads
+    y_new = np.linspace(y[0], y[-1], n_points)
+    interp = lambda a: np.apply_along_axis(lambda row: np.interp(y_new, y, row), -1, a)
+    return y_new, interp(M), interp(T), interp(V)
+
+def design_with_bays(x, bays):
+    # Stretches a 9 bay design vector over another bay count, ribs stay ordered with the first at the root
+    rows = x.reshape(7, -1)
+    old = np.arange(rows.shape[1])
+    new = np.linspace(0, rows.shape[1]-1, bays)
+    rows = np.array([np.interp(new, old, row) for row in rows])
+    rows[0, 0] = 0
+    return rows.flatten()
+
+def run_stages(x, loads, n_points):
+    # One pass through the analysis chain as calc_mass runs it, returns seconds spent per stage
+    y, M, T, V = loads
+    batch_shape = x.shape[:-1]
+    bays = x.shape[-1]//7
+    posRibs, tSkinBay, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom = np.moveaxis(x.reshape(*batch_shape, 7, bays)*order_of_mag.T, -2, 0)
+    M, T, V = (np.reshape(a, a.shape[:-1] + (1,)*len(batch_shape) + a.shape[-1:]) for a in (M, T, V))
+
+    wb = Beam(stringers=L_Stringer(bStringersBay, hStringersBay, tStringersBay), intg_points=n_points)
+    calls = [
+        ('define_spanwise_arrays', lambda: wb.define_spanwise_arrays(y, posRibs, tStringersBay, bStringersBay, hStringersBay, nStringersBayTop, nStringersBayBottom)),
+        ('load_wing_box', lambda: wb.load_wing_box(thickness=tSkinBay, **WING_BOX)),
+        ('get_displacement', lambda: wb.get_displacement(np.stack(np.broadcast_arrays(y, M), axis=-1), E, False)),
+        ('get_twist', lambda: wb.get_twist(np.stack(np.broadcast_arrays(y, T), axis=-1), G, False)),
+        ('get_mass', lambda: wb.get_mass(y)),
+        ('konstantinos_konstantinopoulos', lambda: wb.konstantinos_konstantinopoulos(y, M)),
+        ('getShearStress', lambda: wb.getShearStress(y, V, T)),
+        ('getFailureStresses', lambda: wb.getFailureStresses(y)),
+    ]
+
+    times = {}
+    for name, call in calls:
+        t = time.perf_counter()
+        call()
+        times[name] = time.perf_counter() - t
+    return times
+
+def time_calc_mass(x, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        calc_mass(x, report=False)
+        times.append(time.perf_counter() - t)
+    return times
+
+def benchmark(grid_sizes=(865,), batch_sizes=(1,), bay_counts=(9,), all_cases=False, repeat=20):
+    # Times every stage and the full calc_mass on x_from_print() for each grid size, batch size and bay count.
+    # Returns one record per (stage, configuration), best and median of repeat runs.
+    base_loads = get_all_internal_loads() if all_cases else get_internal_loads()
+    cases = base_loads[1].shape[0] if base_loads[1].ndim > 1 else 1
+    records = []
+
+    for n_points in grid_sizes:
+        loads = resample_loads(base_loads, n_points)
+        set_internal_loads(loads, progress=False)
+
+        for bays in bay_counts:
+            x_ref = design_with_bays(x_from_print(), bays)
+
+            for batch in batch_sizes:
+                x = x_ref if batch == 1 else np.tile(x_ref, (batch, 1))
+                run_stages(x, loads, n_points) # warm up
+                calc_mass(x, report=False)
+
+                stage_times = {name: [] for name in STAGES}
+                for _ in range(repeat):
+                    for name, t in run_stages(x, loads, n_points).items():
+                        stage_times[name].append(t)
+                stage_times['calc_mass'] = time_calc_mass(x, repeat)
+
+                for name, times in stage_times.items():
+                    records.append({'stage': name, 'n_points': n_points, 'batch': batch, 'bays': bays, 'cases': cases, 'repeat': repeat,
+                                    'best': min(times), 'median': float(np.median(times)), 'per_design': min(times)/batch})
+    return records
+
+def report(records):
+    print(f'{"stage":32s} {"points":>6s} {"batch":>5s} {"bays":>4s} {"best [ms]":>10s} {"median [ms]":>11s} {"per design [ms]":>15s}')
+    for r in records:
+        print(f'{r["stage"]:32s} {r["n_points"]:6d} {r["batch"]:5d} {r["bays"]:4d} {r["best"]*1e3:10.3f} {r["median"]*1e3:11.3f} {r["per_design"]*1e3:15.4f}')
+
+def key(r):
+    return r['stage'], r['n_points'], r['batch'], r['bays'], r['cases']
+
+def compare(records, baseline, tolerance=1.25):
+    # Stages whose best time grew by more than tolerance relative to the baseline run
+    base = {key(r): r for r in baseline}
+    slower = []
+    for r in records:
+        b = base.get(key(r))
+        if b is not None and r['best'] > tolerance*b['best']:
+            slower.append((r, r['best']/b['best']))
+            print(f'Regression: {r["stage"]} ({r["n_points"]} points, batch {r["batch"]}, {r["bays"]} bays) {b["best"]*1e3:.3f}ms -> {r["best"]*1e3:.3f}ms ({r["best"]/b["best"]:.2f}x)')
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the calc_mass analysis chain')
+    parser.add_argument('--points', type=int, nargs='+', default=[865])
+    parser.add_argument('--batch', type=int, nargs='+', default=[1])
+    parser.add_argument('--bays', type=int, nargs='+', default=[9])
+    parser.add_argument('--all-cases', action='store_true')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', default=None, help='earlier --output file; exits with 1 if a stage got slower')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    records = benchmark(args.points, args.batch, args.bays, args.all_cases, args.repeat)
+    report(records)
+    with open(args.output, 'w') as f:
+        json.dump({'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(), 'time': time.time(), 'records': records}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['records']
+        return 1 if compare(records, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+from globalParameters import *
+import numpy as np
+import scipy as sp
+
+
+class BucklingCurve():
+    def __init__(self, x_data, y_data, lut_points=None):
+        # Cubic fit through digitised chart points, built once and held constant outside the chart range.
+        # lut_points switches evaluation to a dense uniform table with linear interpolation.
+        self.x_data = np.array(x_data, dtype=float)
+        self.y_data = np.array(y_data, dtype=float)
+        self.spline = sp.interpolate.make_interp_spline(self.x_data, self.y_data, k=3)
+        self.dspline = self.spline.derivative()
+        self.lut_points = lut_points
+
+        if lut_points:
+            self.x_lut = np.linspace(self.x_data[0], self.x_data[-1], lut_points)
+            self.dx_lut = self.x_lut[1] - self.x_lut[0]
+            self.f_lut = self.spline(self.x_lut)
+            self.df_lut = self.dspline(self.x_lut)
+
+    def lookup(self, table, x):
+        pos = (x - self.x_data[0])/self.dx_lut
+        idx = np.clip(pos.astype(int), 0, self.lut_points-2)
+        frac = pos - idx
+        return table[idx] + (table[idx+1] - table[idx])*frac
+
+    def __call__(self, a_b):
+        # Complex input is handled as a complex step: f(x) + i*f'(x)*h
+        a_b = np.asarray(a_b)
+        x = np.clip(a_b.real, self.x_data[0], self.x_data[-1])
+        f = self.lookup(self.f_lut, x) if self.lut_points else self.spline(x)
+
+        if np.iscomplexobj(a_b):
+            inside = (a_b.real > self.x_data[0]) & (a_b.real < self.x_data[-1])
+            df = self.lookup(self.df_lut, x) if self.lut_points else self.dspline(x)
+            f = f + 1j*df*a_b.imag*inside
+
+        return f
+
+
+# CHART CURVES: buckling coefficient against aspect ratio a/b
+BUCKLING_CURVES = {
+    # Shear buckling coefficient k_s, clamped edges
+    'shear': BucklingCurve([1.00, 1.17, 1.50, 1.750, 2.00, 2.50, 3.0, 4.0, 5.0],
+                           [15.0, 13.0, 11.6, 10.84, 10.4, 9.84, 9.7, 9.5, 9.53]),
+    # Skin compression buckling coefficient k_c
+    'skin': BucklingCurve([0.7,  0.85, 1.0, 1.15, 1.3, 1.67, 2.0, 2.2, 2.5, 2.75, 3.0, 3.2, 3.35, 3.70, 4.18, 4.66, 4.8, 5.0],
+                          [10.7, 8.16, 6.8, 6.17, 5.8, 5.6,  4.9, 4.7, 4.6, 4.70, 4.5, 4.4, 4.4,  4.45, 4.27, 4.35, 4.3, 4.3]),
+}
+
+# COLUMN END FIXITY K
+END_FIXITY = {
+    'SS': K_SS, # pinned-pinned
+    'CC': K_CC, # clamped-clamped
+    'FC': K_FC, # free-clamped
+    'PC': K_one_pinned_one_fixed, # pinned-clamped
+}
+
+def add_curve(name, x_data, y_data, lut_points=None):
+    BUCKLING_CURVES[name] = BucklingCurve(x_data, y_data, lut_points)
+    return BUCKLING_CURVES[name]
+
+def use_lut(lut_points=4096):
+    # Rebuild every curve as a dense lookup table (lut_points=None goes back to the splines)
+    for name, curve in BUCKLING_CURVES.items():
+        BUCKLING_CURVES[name] = BucklingCurve(curve.x_data, curve.y_data, lut_points)
+
+
+if __name__ == '__main__':
+    print(f'Wrong file dummy')
@@ -4,11 +4,16 @@ from typing import Callable
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy as sp
+import os
+import sys
 import warnings
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from WP4.WP4_1.loadCache import LoadCache # shared with WP4
 
 # CONSTANTS
 NULL_ARRAY_2 = np.zeros((2,1)) # 0-load array (for 2-row point loads)
 NULL_ARRAY_3 = np.zeros((3,1)) # 0-load araray (for 3-row point loads)
+PARAMETER_FILES = (os.path.join(os.path.dirname(os.path.abspath(__file__)), 'globalParameters.py'),) # model constants the loading depends on, hashed into LoadCache keys
 
             
 class DimensionError(Exception):
@@ -17,6 +22,7 @@ class DimensionError(Exception):
 
 class Calc():
     def __init__(self, file0, file10):
+        self.files = (file0, file10)
         with open(file0) as data0:
             dat0 = np.genfromtxt(data0, skip_header=21, invalid_raise=False)
 
@@ -59,6 +65,8 @@ class Calc():
         self.Cd = None
         self.Cm = None
         self.alpha = None
+        self.loadCase = None
+        self.q = q
 
         self.D = 0
 
@@ -81,6 +89,8 @@ class Calc():
 
     def set_load_case_from_flight(self, n, W, V=V_CR, rho=RHO, Sref=S):
         q_here = 0.5*rho*V**2
+        self.q = q_here
+        self.loadCase = (n, W, V, rho, Sref)
         CLd = n*W/(q_here*Sref)
         
         t = (CLd - self.CL0) / (self.CL10 - self.CL0)
@@ -97,13 +107,13 @@ class Calc():
     def calcNormal(self, y, alphaA):
         c = self.chord(y)
         alphaA = np.deg2rad(alphaA)
-        L = self.Cl(y)*q*c
-        D = self.Cd(y)*q*c
+        L = self.Cl(y)*self.q*c
+        D = self.Cd(y)*self.q*c
         
         return np.cos(alphaA)*L + np.sin(alphaA)*D
     
     def momentUnitSpan(self, y):
-        return self.Cm(y)*q*self.chord(y)**2
+        return self.Cm(y)*self.q*self.chord(y)**2
 
     # INERTIAL LOADING
     def inertialLoading(self, y, massWing, n=1):
@@ -165,8 +175,28 @@ class Calc():
             
         return T
     
+    # O(N) alternative to the vectorized shear/moment/torsion above: one cumulative sweep over the grid.
+    # Integral from each station up to the last station, as the tail integrals above.
+    def tailIntegral(self, xVals, yVals):
+        cumulative = sp.integrate.cumulative_simpson(y=yVals, x=xVals, initial=0)
+        return cumulative[-1] - cumulative
+
+    # Sum of point loads outboard of each station (position, load, ...) (shape 2xn or 3xn)
+    def pointLoadSteps(self, xVals, pointLoads):
+        return np.sum(pointLoads[1] * (xVals[:, None] < pointLoads[0]), axis=1)
+
+    def internalLoads(self, xVals, loadingVals, torsionLoadVals, pointLoads, pointMoments, pointTorques):
+        shearVals = self.tailIntegral(xVals, loadingVals) + self.pointLoadSteps(xVals, pointLoads)
+        momentVals = -(self.tailIntegral(xVals, shearVals) + self.pointLoadSteps(xVals, pointMoments))
+        torsionVals = self.tailIntegral(xVals, torsionLoadVals) + self.pointLoadSteps(xVals, pointTorques)
+
+        return shearVals, momentVals, torsionVals
+
     ############ PLOTTING ##############
-    def plot(self, aeroLoading, inertialLoading, torsionLoading, loadingDist, pointLoads, pointMoments, pointTorques, lims, subplots = True, plot = True, step=0.01, debug=False):
+    # method='cumulative' uses internalLoads (O(N)); method='vectorize' the original per-station integrals (O(N²))
+    # With a LoadCache, results are reused across runs. cacheParams must hold whatever the loading
+    # functions depend on beyond the flight case (e.g. load factor and wing mass passed to totalLoading).
+    def plot(self, aeroLoading, inertialLoading, torsionLoading, loadingDist, pointLoads, pointMoments, pointTorques, lims, subplots = True, plot = True, step=0.01, debug=False, method='cumulative', cache=None, cacheParams=(), name=ARRAY_PATH):
         if not debug:
             warnings.simplefilter('ignore', category = UserWarning)
         
@@ -176,20 +206,35 @@ class Calc():
 
         self.xMin, self.xMax = lims
         self.step = step
-        xVals = np.arange(self.xMin, self.xMax, step)
-        loadingVals = aeroLoading(xVals)     
 
-        self.shearVec = np.vectorize(self.shear, signature='(),(),(3,1)->()')
-        shearVals = self.shearVec(xVals, lambda x: aeroLoading(x) + inertialLoading(x), pointLoads)
-        
-        self.momentVec = np.vectorize(self.moment, signature='(),(n),(m,l)->()')
-        momentVals = self.momentVec(xVals, shearVals, pointMoments)
-        
-        self.torsionVec = np.vectorize(self.torsion, signature='(),(m),(3,1),(2,1)->()')
-        torsionLoadVals = torsionLoading(xVals) + aeroLoading(xVals)*loadingDist(xVals)
-        torsionVals = self.torsionVec(xVals, torsionLoadVals, pointLoads, pointTorques)
+        cached = None
+        if cache is not None:
+            key = cache.key((*self.files, __file__, *PARAMETER_FILES), self.loadCase, cacheParams, lims, step, method, pointLoads, pointMoments, pointTorques)
+            cached = cache.get(key)
+
+        if cached is not None:
+            xVals, momentVals, torsionVals, shearVals = cached
+        else:
+            xVals = np.arange(self.xMin, self.xMax, step)
+            loadingVals = aeroLoading(xVals)     
+            torsionLoadVals = torsionLoading(xVals) + loadingVals*loadingDist(xVals)
+
+            if method == 'cumulative':
+                shearVals, momentVals, torsionVals = self.internalLoads(xVals, loadingVals + inertialLoading(xVals), torsionLoadVals, pointLoads, pointMoments, pointTorques)
+            else:
+                self.shearVec = np.vectorize(self.shear, signature='(),(),(3,1)->()')
+                shearVals = self.shearVec(xVals, lambda x: aeroLoading(x) + inertialLoading(x), pointLoads)
+                
+                self.momentVec = np.vectorize(self.moment, signature='(),(n),(m,l)->()')
+                momentVals = self.momentVec(xVals, shearVals, pointMoments)
+                
+                self.torsionVec = np.vectorize(self.torsion, signature='(),(m),(3,1),(2,1)->()')
+                torsionVals = self.torsionVec(xVals, torsionLoadVals, pointLoads, pointTorques)
+
+            if cache is not None:
+                cache.put(key, np.vstack((xVals, momentVals, torsionVals, shearVals)))
+            np.savez(name, xVals, momentVals, torsionVals) # cache hits leave the file of the computing run
         
-        np.savez(ARRAY_PATH, xVals, momentVals, torsionVals)
         # return
         print('Plotting!')
         # Plot with subplots
@@ -220,9 +265,9 @@ class Calc():
             # ax4.set_ylabel('Lift [Nm]')
             
             fig.set_size_inches(15,5)
-            fig.suptitle(fr'{ARRAY_PATH} Internal Loading Diagrams', size='16', weight='semibold')
+            fig.suptitle(fr'{name} Internal Loading Diagrams', size='16', weight='semibold')
             fig.tight_layout()
-            fig.savefig(fr'diagrams\totalDiagram{ARRAY_PATH}')
+            fig.savefig(f'diagrams/totalDiagram{name}.png')
             
         # Plot in sequential plots
         if plot and not subplots:
@@ -234,7 +279,7 @@ class Calc():
             plt.ylabel('Shear Force [kN]')
             plt.tight_layout()
             
-            plt.savefig(f'diagrams/shearForceDiagram{ARRAY_PATH}.png')
+            plt.savefig(f'diagrams/shearForceDiagram{name}.png')
             plt.clf()
             plt.grid()
 
@@ -244,7 +289,7 @@ class Calc():
             plt.ylabel('Bending Moment [kNm]')
             plt.tight_layout()
 
-            plt.savefig(f'diagrams/bendingMomentDiagram{ARRAY_PATH}.png')
+            plt.savefig(f'diagrams/bendingMomentDiagram{name}.png')
             plt.clf()
             plt.grid()
             plt.tight_layout()
@@ -255,7 +300,7 @@ class Calc():
             plt.ylabel('Torsion [kNm]')
             plt.tight_layout()
 
-            plt.savefig(f'diagrams/torsionDiagram{ARRAY_PATH}.png')
+            plt.savefig(f'diagrams/torsionDiagram{name}.png')
             plt.clf()
             
         return np.vstack((xVals, momentVals, torsionVals, shearVals))
@@ -0,0 +1,77 @@
+import os
+import time
+import numpy as np
+
+
+class Checkpoint():
+    def __init__(self, path='checkpoint.npz', every=10, tol=1e-6):
+        # Optimizer callback that writes the current iterate, the best design so far and the
+        # iteration counters to path every `every` iterations. Best is the lowest feasible mass,
+        # or the lowest constraint violation while nothing is feasible yet.
+        self.path = path
+        self.every = every
+        self.tol = tol
+        self.nit = 0
+        self.nit_offset = 0 # iterations done before a resume
+        self.nfev = 0
+        self.x = None
+        self.x_best = None
+        self.fun_best = np.inf
+        self.violation_best = np.inf
+        self.extra = {}
+
+    def is_better(self, fun, violation):
+        feasible = violation <= self.tol
+        if feasible and self.violation_best <= self.tol:
+            return fun < self.fun_best
+        return feasible or violation < self.violation_best
+
+    def __call__(self, intermediate_result):
+        r = intermediate_result
+        violation = r.get('constr_violation', 0.0)
+        self.nit = self.nit_offset + r.get('nit', 0)
+        self.nfev = r.get('nfev', 0)
+        self.x = np.array(r.x)
+
+        if self.is_better(r.fun, violation):
+            self.x_best, self.fun_best, self.violation_best = self.x.copy(), float(r.fun), float(violation)
+
+        if self.nit % self.every == 0:
+            self.save()
+
+    def save(self, **extra):
+        if self.x is None:
+            return
+        self.extra.update(extra)
+        if self.x_best is None:
+            self.x_best = self.x
+        # Atomic write, so a job killed mid-save still leaves the previous checkpoint intact
+        tmp = f'{self.path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp, x=self.x, x_best=self.x_best, fun_best=self.fun_best, violation_best=self.violation_best,
+                 nit=self.nit, nfev=self.nfev, wall=time.time(), **self.extra)
+        os.replace(tmp, self.path)
+
+    def finish(self, result, **extra):
+        # Final result of the run, saved with finished=True so a resume reports it instead of optimising again
+        self.x = np.array(result.x)
+        violation = result.get('constr_violation', 0.0)
+        if self.is_better(result.fun, violation):
+            self.x_best, self.fun_best, self.violation_best = self.x.copy(), float(result.fun), float(violation)
+        self.save(finished=True, **extra)
+
+    def resume(self):
+        # Restores counters and best design from path, returns the stored checkpoint (None if there is none)
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path) as f:
+            data = {k: f[k] for k in f.files}
+        self.x, self.x_best = data['x'], data['x_best']
+        self.fun_best, self.violation_best = float(data['fun_best']), float(data['violation_best'])
+        self.nit_offset = self.nit = int(data['nit'])
+        self.nfev = int(data['nfev'])
+        self.extra = {k: v for k, v in data.items() if k not in ('x', 'x_best', 'fun_best', 'violation_best', 'nit', 'nfev', 'wall')}
+        return data
+
+
+if __name__ == '__main__':
+    print(f'Wrong file dummy')
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class EvalCache():
+    def __init__(self, function, maxsize: int = 128) -> None:
+        # Memoizes function(x) on the exact design vector, so the objective and the
+        # constraints of one design share a single analysis.
+        self.function = function
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, x):
+        x = np.ascontiguousarray(x, dtype=float)
+        return x.shape, x.tobytes()
+
+    def __call__(self, x):
+        k = self.key(x)
+        if k in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(k)
+            return self.entries[k]
+
+        self.misses += 1
+        result = self.function(x)
+        self.entries[k] = result
+
+        # LRU eviction
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def report_stats(self):
+        total = self.hits + self.misses
+        rate = self.hits/total if total else 0
+        print(f'Cache: {self.hits} hits / {self.misses} misses ({rate*100:.1f}%) | {len(self.entries)}/{self.maxsize} entries')
+
+
+if __name__ == '__main__':
+    print(f'Wrong file dummy')
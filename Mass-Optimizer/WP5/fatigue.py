@@ -0,0 +1,50 @@
+from globalParameters import *
+import numpy as np
+import scipy as sp
+
+# Paris law crack growth, dc/dN = A*(Y*Δσ*sqrt(πc))^m with ΔK in MPa√m and c in m.
+# All functions broadcast over stress ranges, spanwise stations and load cases.
+
+
+def growth_rate(c, delta_sigma, A=PARIS_A, m=PARIS_M, Y=SHAPE_FACTOR):
+    Y = Y(c) if callable(Y) else Y
+    return A*(Y*delta_sigma/1e6*np.sqrt(np.pi*c))**m
+
+def equivalent_stress_range(delta_sigma, counts, m=PARIS_M):
+    # Constant amplitude range with the same growth per block as the spectrum (blocks on the last axis),
+    # no load interaction (retardation) effects
+    counts = np.asarray(counts)
+    return (np.sum(counts*np.asarray(delta_sigma)**m, axis=-1)/np.sum(counts))**(1/m)
+
+def cycles_to_failure(delta_sigma, c_crit, c0=CRACK_INITIAL, A=PARIS_A, m=PARIS_M, Y=SHAPE_FACTOR, n_steps=200):
+    # Cycles to grow a crack from c0 to c_crit. Closed form for a constant Y, a Y(c) callable is integrated
+    # numerically on a geometric crack length grid (new last axis) instead.
+    delta_sigma, c_crit = np.asarray(delta_sigma), np.asarray(c_crit)
+    c_crit = np.where(c_crit.real < c0, c0, c_crit)
+    if callable(Y):
+        s = np.linspace(0, 1, n_steps)
+        c = c0*(c_crit[..., None]/c0)**s # log spaced, dense at c0 where growth is slowest
+        rate = growth_rate(c, delta_sigma[..., None], A, m, Y)
+        return sp.integrate.trapezoid(1/rate, c, axis=-1)
+
+    k = A*(Y*delta_sigma/1e6*np.sqrt(np.pi))**m
+    if m == 2:
+        return np.log(c_crit/c0)/k
+    return (c_crit**(1-m/2) - c0**(1-m/2))/((1-m/2)*k)
+
+def critical_crack_length(sigma_max, K_c=K_1C, Y=SHAPE_FACTOR):
+    # Crack length [m] at which the peak stress of the spectrum reaches the fracture toughness
+    return (K_c/(Y*np.asarray(sigma_max)))**2/np.pi
+
+def spectrum_ranges(sigma_ref, spectrum=FATIGUE_SPECTRUM):
+    # Stress ranges (..., blocks) of a spectrum given as (range/sigma_ref, cycles), and the cycles of each block
+    fractions, counts = np.array(spectrum, dtype=float).T
+    return np.asarray(sigma_ref)[..., None]*fractions, counts
+
+def fatigue_margin(life, flights=FATIGUE_FLIGHTS, m=PARIS_M):
+    # Life ratio as a stress ratio, (life/required)^(1/m) = allowable/applied stress range at a fixed critical length, >= 1 is safe
+    return (life/flights)**(1/m)
+
+
+if __name__ == '__main__':
+    print(f'Wrong file dummy')
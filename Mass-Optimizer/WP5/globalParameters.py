@@ -7,6 +7,9 @@ POISSON_RATIO = 1/3
 SHAPE_FACTOR = 1.1 # SHAPE FACTOR
 CRACK_LENGTH = 1.5e-3 #[m]
 K_1C = 26e6
+CRACK_INITIAL = 0.01e-3 #[m] initial flaw for crack growth
+PARIS_A = 1.85e-11 # [m/cycle], with ΔK in MPa√m
+PARIS_M = 4.05
 SIGMA_Y_TENS = 450e6
 SIGMA_Y_COMP = 450e6
 
@@ -84,5 +87,18 @@ ARRAY_PATH = 'Case 5'
 
 q = 0.5*RHO*V_CR**2
 
+# ALL LOAD CASES (V_CR, LOAD_FACTOR, ARRAY_PATH), for sizing against every case in one run
+LOAD_CASES = [
+    (45.2, -1, 'Case1'),
+    (64.5, 2, 'Case2'),
+    (88.2, 3.8, 'Case3'),
+    (200.6, -1*1.5, 'Case 4'),
+    (291.8, 3.8*1.5, 'Case 5'),
+]
+
+# FATIGUE SPECTRUM per flight: (stress range / 1g stress, cycles), ground-air-ground plus gusts
+FATIGUE_SPECTRUM = [(1.0, 1), (0.3, 10)]
+FATIGUE_FLIGHTS = 40000 # required crack growth life
+
 # SL
 # RHO_SL = 1.225
\ No newline at end of file
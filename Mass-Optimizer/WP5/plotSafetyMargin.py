@@ -26,24 +26,28 @@ class DimensionError(Exception):
 
 
 # y values, raw applied stress values, failure stress, safety factor for applied stress
-def plotFailureMargin(yVals: NDArray, sigmaAppliedVals: NDArray, sigmaFail: NDArray, n: float) -> None:
+def plotFailureMargin(yVals: NDArray, sigmaAppliedVals: NDArray, sigmaFail: NDArray, n: float, show: bool = True):
     # Check for correct parameter dimensions/types
     if yVals.shape != sigmaAppliedVals.shape:
         raise DimensionError('yVals and sigmaAppliedVals must have same length!')
                 
 
     # Array of failure stress values to allow for array division
-    safetyMarginArray = sigmaFail/sigmaAppliedVals
+    safetyMarginArray = sigmaFail/(n*sigmaAppliedVals)
     
-    ax, fig = plt.subplots(1, 1)        
+    fig, ax = plt.subplots(1, 1)
+    ax.plot(np.atleast_2d(yVals).T, np.atleast_2d(safetyMarginArray).T)
+    ax.axhline(1, color='k', linestyle='--', linewidth=1)
             
     ax.set_xlabel('y [m]')
     ax.set_ylabel('Margin of Safety [-]')
     ax.grid()
                 
-    fig.tight_layout()
     fig.suptitle('Margins of Safety *failure mode*')
-    plt.show()
+    fig.tight_layout()
+    if show:
+        plt.show()
+    return fig, ax
     
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+from Main import *
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import numpy as np
+
+# Headless (Agg) diagrams of many designs and load cases. The analysis runs vectorised in the calling process,
+# the worker processes only draw: each builds every figure once and swaps the line data for every job.
+
+# Margin columns of get_station_margins (shear, compression, tension), None for edges that never buckle (spar webs)
+MODES = ['Shear buckling front spar', 'Shear buckling rear spar', 'Skin buckling top', None, 'Skin buckling bottom', None,
+         'Column buckling', 'Compressive yield', 'Tensile yield', 'Crack propagation', 'Fatigue']
+MARGIN_LIMITS = (0.5, 50) # unloaded stations have near infinite margins, clipped to the plot
+KINDS = ['loads', 'stiffness', 'deflection', 'margins']
+
+TEMPLATES = {} # figure, axes and lines per kind, built once per process
+
+
+def new_figure(rows, cols, size):
+    fig = Figure(figsize=size)
+    FigureCanvasAgg(fig)
+    return fig, np.atleast_1d(fig.subplots(rows, cols))
+
+def loads_template():
+    fig, axes = new_figure(1, 3, (15, 5))
+    lines = []
+    for ax, title, label, color in zip(axes, ['Shear Force Diagram', 'Bending Moment Diagram', 'Torsion Diagram'],
+                                       ['Shear Force [kN]', 'Bending Moment [kNm]', 'Torsion [kNm]'], ['blue', 'red', 'purple']):
+        lines += ax.plot([], [], color=color)
+        ax.set_title(title)
+        ax.set_xlabel('y [m]')
+        ax.set_ylabel(label)
+        ax.grid()
+    return fig, axes, lines
+
+def stiffness_template():
+    fig, axes = new_figure(1, 1, (6.4, 4.8))
+    ax = axes[0]
+    lines = ax.plot([], [], label=f'I$_x$$_x$') + ax.plot([], [], label=f'J')
+    ax.set_title('Stiffness Diagram')
+    ax.set_xlabel('y [$m$]')
+    ax.set_ylabel('Stiffness × $10^4$ [$m^4$]')
+    ax.grid(which='both')
+    ax.legend()
+    return fig, axes, lines
+
+def deflection_template():
+    fig, axes = new_figure(1, 1, (6.4, 4.8))
+    ax = axes[0]
+    lines = ax.plot([], []) + ax.plot([], [])
+    ax.set_title('Deflection / Twisting Diagram')
+    ax.set_xlabel('y [$m$]')
+    ax.set_ylabel('Normalised value')
+    ax.set_ylim(-1, 1)
+    ax.set_autoscaley_on(False)
+    ax.grid(which='both')
+    return fig, axes, lines
+
+def margins_template():
+    fig, axes = new_figure(1, 1, (9, 5))
+    ax = axes[0]
+    lines = [ax.plot([], [], label=mode, linestyle='--' if i >= 10 else '-')[0] for i, mode in enumerate(MODES)] # colour cycle wraps at 10
+    ax.axhline(1, color='k', linestyle='--', linewidth=1)
+    ax.set_title('Margins of Safety')
+    ax.set_xlabel('y [m]')
+    ax.set_ylabel('Margin of Safety [-]')
+    ax.set_yscale('log')
+    ax.set_ylim(*MARGIN_LIMITS)
+    ax.set_autoscaley_on(False)
+    ax.grid(which='both')
+    return fig, axes, lines
+
+TEMPLATE_BUILDERS = {'loads': loads_template, 'stiffness': stiffness_template, 'deflection': deflection_template, 'margins': margins_template}
+
+def get_template(kind):
+    if kind not in TEMPLATES:
+        fig, axes, lines = TEMPLATES[kind] = TEMPLATE_BUILDERS[kind]()
+        fig.suptitle(' ', weight='bold')
+        fig.tight_layout() # once, rerunning the layout for every job costs more than the drawing
+    return TEMPLATES[kind]
+
+def analyse_cases(designs, loads):
+    # Every design (P, 63) under every load case (loads as set by init_worker), arrays shaped (C, P, N, ...)
+    designs = np.atleast_2d(designs)
+    y, M, T, V = loads
+    M, T, V = (np.reshape(a, (-1, 1, y.size)) for a in (M, T, V))
+
+    wb = build_beam(designs, y)
+    v = wb.get_displacement(np.stack(np.broadcast_arrays(y, M), axis=-1), E, False)
+    theta = wb.get_twist(np.stack(np.broadcast_arrays(y, T), axis=-1), G, False)
+    margins = np.concatenate(get_station_margins(wb, y, M, V, T), axis=-1)
+    shape = margins.shape[:-1]
+    return {'y': y, 'M': np.broadcast_to(M, shape), 'T': np.broadcast_to(T, shape), 'V': np.broadcast_to(V, shape),
+            'Ixx': np.broadcast_to(wb.Ixx_list, shape), 'J': np.broadcast_to(wb.J, shape), 'v': v, 'theta': theta, 'margins': margins}
+
+def get_jobs(results, labels, case_names):
+    # One job per (design, case), holding only the arrays its figures need
+    jobs = []
+    for c, case in enumerate(case_names):
+        for p, label in enumerate(labels):
+            jobs.append({'name': f'{label}_{case}'.replace(' ', ''), 'title': f'{label} | {case}', 'y': results['y'],
+                         **{key: results[key][c, p] for key in results if key != 'y'}})
+    return jobs
+
+def draw(kind, job):
+    fig, axes, lines = get_template(kind)
+    y = job['y']
+    if kind == 'loads':
+        data = [job['V']/1000, job['M']/1000, job['T']/1000]
+    elif kind == 'stiffness':
+        data = [job['Ixx']*1e4, job['J']*1e4]
+    elif kind == 'deflection':
+        v, theta = job['v'], job['theta']
+        data = [v/np.max(np.abs(v)), theta/np.max(np.abs(theta))]
+        lines[0].set_label(f'v | max {v[-1]:.4g} m')
+        lines[1].set_label(f'theta | max {np.max(np.abs(theta))*180/np.pi*np.sign(theta[-1]):.4g}°')
+    else:
+        margins = np.clip(job['margins'], *MARGIN_LIMITS)
+        data = [margins[:, i] if mode and i < margins.shape[-1] else None for i, mode in enumerate(MODES)]
+
+    for line, values in zip(lines, data):
+        line.set_visible(values is not None)
+        line.set_data(y, values if values is not None else np.full(y.shape, np.nan))
+    for ax in axes:
+        ax.set_xlim(0, y[-1])
+        ax.relim()
+        ax.autoscale_view()
+    if kind in ['deflection', 'margins']:
+        axes[0].legend(handles=[line for line in lines if line.get_visible()], loc='upper right', fontsize='small')
+
+    fig.suptitle(job['title'], weight='bold')
+    return fig
+
+def render_job(job, directory='diagrams', kinds=KINDS):
+    paths = []
+    for kind in kinds:
+        fig = draw(kind, job)
+        paths.append(os.path.join(directory, f'{kind}_{job["name"]}.png'))
+        fig.savefig(paths[-1])
+    return paths
+
+def render_jobs(jobs, directory='diagrams', kinds=KINDS, workers=None):
+    # workers=1 renders in this process
+    os.makedirs(directory, exist_ok=True)
+    if workers == 1:
+        paths = [render_job(job, directory, kinds) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs)//(4*(workers or os.cpu_count() or 1)))
+            paths = list(pool.map(render_job, jobs, [directory]*len(jobs), [kinds]*len(jobs), chunksize=chunksize))
+    return [p for job_paths in paths for p in job_paths]
+
+def report_cases(designs, loads=None, labels=None, directory='diagrams', kinds=KINDS, workers=None, fatigue_life=False):
+    # Diagrams of every design under every load case (all of LOAD_CASES unless single case loads are given)
+    designs = np.atleast_2d(designs)
+    loads = get_all_internal_loads() if loads is None else loads
+    init_worker(loads, fatigue_life=fatigue_life) # same set up as an optimiser worker
+    case_names = [name for *_, name in LOAD_CASES] if np.ndim(loads[1]) > 1 else [ARRAY_PATH]
+    labels = labels or [f'design{i}' for i in range(len(designs))]
+
+    results = analyse_cases(designs, loads)
+    paths = render_jobs(get_jobs(results, labels, case_names), directory, kinds, workers)
+    print(f'Rendered {len(paths)} diagrams of {len(designs)} designs x {len(case_names)} load cases to {directory}')
+    return paths
+
+
+if __name__ == '__main__':
+    report_cases(x_from_print(), fatigue_life='--fatigue' in sys.argv)
@@ -0,0 +1,81 @@
+import numpy as np
+import scipy as sp
+
+
+class Surrogate():
+    def __init__(self, bounds, min_points=None, max_points=400, kernel='thin_plate_spline', confidence=2.0):
+        # RBF fit of (mass, constraints) on evaluated designs, trained online and refitted lazily when new points arrive.
+        # Only the max_points most recent designs are kept. The error used to call a design confidently infeasible
+        # is the 95th percentile of the prediction residuals seen so far, times confidence.
+        self.lb, self.ub = np.asarray(bounds.lb), np.asarray(bounds.ub)
+        self.min_points = min_points or 2*self.lb.size + 1 # thin plate splines need more points than dimensions
+        self.max_points = max_points
+        self.kernel = kernel
+        self.confidence = confidence
+        self.X = np.empty((0, self.lb.size))
+        self.Y = np.empty((0, 0))
+        self.residuals = []
+        self.model = None
+        self.active = np.ones(self.lb.size, dtype=bool)
+        self.stale = False
+        self.evaluated = 0
+        self.screened = 0
+
+    @property
+    def ready(self):
+        return len(self.X) >= self.min_points
+
+    def scale(self, x):
+        # Unit box over the bounds, keeping only the variables that vary in the training set (e.g. the root rib is always 0)
+        return ((np.atleast_2d(x) - self.lb)/(self.ub - self.lb))[:, self.active]
+
+    def add(self, x, mass, constr):
+        # Designs already in the training set (repeated DE trials or candidates) are dropped, duplicate rows make the RBF system singular
+        x, y = np.atleast_2d(x), np.column_stack([np.atleast_1d(mass), np.atleast_2d(constr)])
+        self.evaluated += len(x)
+        new = np.zeros(len(x), dtype=bool)
+        new[np.unique(x, axis=0, return_index=True)[1]] = True
+        new &= ~(x[:, None, :] == self.X[None, :, :]).all(axis=-1).any(axis=-1)
+        if not new.any():
+            return
+        x, y = x[new], y[new]
+        self.X = np.vstack([self.X, x])[-self.max_points:]
+        self.Y = np.vstack([self.Y.reshape(-1, y.shape[1]), y])[-self.max_points:]
+        self.stale = True
+
+    def fit(self):
+        if self.stale:
+            self.active = np.ptp(self.X, axis=0) > 0
+            self.model = sp.interpolate.RBFInterpolator(self.scale(self.X), self.Y, kernel=self.kernel, smoothing=1e-8)
+            self.stale = False
+
+    def predict(self, x):
+        # Returns predicted mass (P,) and constraints (P, 7)
+        self.fit()
+        y = self.model(self.scale(x))
+        return y[:, 0], y[:, 1:]
+
+    def record_error(self, constr_pred, constr):
+        self.residuals.extend(np.abs(np.atleast_2d(constr) - np.atleast_2d(constr_pred)))
+        self.residuals = self.residuals[-self.max_points:]
+
+    def error(self):
+        if len(self.residuals) < 10:
+            return None
+        return np.quantile(self.residuals, 0.95, axis=0)
+
+    def confidently_infeasible(self, constr_pred, lb, ub):
+        err = self.error()
+        if err is None:
+            return np.zeros(len(constr_pred), dtype=bool)
+        err = self.confidence*err
+        return ((constr_pred + err < lb) | (constr_pred - err > ub)).any(axis=-1)
+
+    def report_stats(self):
+        total = self.evaluated + self.screened
+        rate = self.screened/total if total else 0
+        print(f'Surrogate: {self.evaluated} analyses / {self.screened} screened out ({rate*100:.1f}%) | {len(self.X)}/{self.max_points} training points')
+
+
+if __name__ == '__main__':
+    print(f'Wrong file dummy')
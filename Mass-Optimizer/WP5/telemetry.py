@@ -0,0 +1,104 @@
+import json
+import os
+import time
+import numpy as np
+
+
+class Telemetry():
+    def __init__(self, path=None, flush_every=100):
+        # One row per evaluation. path ending in .npz collects rows and saves them on close(),
+        # anything else is written as JSON lines. Without a path every call returns immediately.
+        self.path = path
+        self.enabled = path is not None
+        self.flush_every = flush_every
+        self.count = 0
+        self.rows = []
+        self.stages = {}
+        self.file = open(path, 'w') if self.enabled and not path.endswith('.npz') else None
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.stages = {}
+        self.t0 = self.t = time.perf_counter()
+
+    def stage(self, name):
+        # Time since the previous stage (or start) is booked on name
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0) + now - self.t
+        self.t = now
+
+    def record(self, **values):
+        if not self.enabled:
+            return
+        row = {'eval': self.count, 'wall': time.time(), 't_total': time.perf_counter() - self.t0}
+        row.update({f't_{name}': t for name, t in self.stages.items()})
+        row.update({k: np.real(v).tolist() if isinstance(v, (np.ndarray, np.generic, complex)) else v for k, v in values.items()})
+        self.count += 1
+        self.write(row)
+
+    def write(self, row):
+        if self.file is None:
+            self.rows.append(row)
+            return
+        self.file.write(json.dumps(row) + '\n')
+        if self.count % self.flush_every == 0:
+            self.file.flush()
+
+    def save(self):
+        columns = {}
+        for k in dict.fromkeys(k for r in self.rows for k in r): # rows of different kinds carry different keys
+            values = [r.get(k) for r in self.rows]
+            try:
+                columns[k] = np.array(values)
+            except ValueError: # ragged, e.g. batched evaluations of different sizes
+                columns[k] = np.array(values, dtype=object)
+        np.savez(self.path, **columns)
+
+    def flush(self):
+        # Everything recorded so far to disk, for pool workers that exit without close()
+        if not self.enabled:
+            return
+        if self.file is not None:
+            self.file.flush()
+        elif self.rows:
+            self.save()
+
+    def merge(self, paths):
+        # Appends the rows of other telemetry files (the pool workers'), tagged with their file name, and deletes them
+        if not self.enabled:
+            return
+        for path in paths:
+            for row in load_npz(path) if path.endswith('.npz') else load_jsonl(path):
+                self.write({**row, 'source': os.path.basename(path)})
+            os.remove(path)
+
+    def close(self):
+        if not self.enabled:
+            return
+        if self.file is not None:
+            self.file.close()
+        elif self.rows:
+            self.save()
+        self.enabled = False
+
+
+def load_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def load_npz(path):
+    with np.load(path, allow_pickle=True) as f:
+        columns = {k: f[k].tolist() for k in f.files}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def worker_path(path, pid):
+    # path with the process id ahead of the extension, run.npz -> run.1234.npz
+    root, ext = os.path.splitext(path)
+    return f'{root}.{pid}{ext}'
+
+
+if __name__ == '__main__':
+    print(f'Wrong file dummy')